@@ -1,109 +1,75 @@
 import sys
 import os
 import glob
-import requests
 import json
 import time
-from datetime import datetime
+from collections import OrderedDict
 from PySide6.QtWidgets import (
     QWidget, QApplication, QMessageBox, QPushButton,
-    QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QProgressBar
+    QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QProgressBar, QCheckBox, QLineEdit
 )
-from PySide6.QtCore import Qt, QThread, Signal, QTimer
+from PySide6.QtCore import Qt, QTimer, QSettings
 from PySide6.QtGui import QPixmap, QMovie, QFont, QIcon
+from weather_record import RegionCatalog, format_number
+from weather_client import default_client
+from weather_pool import WeatherWorkerPool, PRIORITY_USER, PRIORITY_REFRESH
+from weather_bundle import SnapshotBundle, BundleError, load_key
+from weather_alerts import AlertEngine, load_rules, open_alert_log
+from weather_changes import ChangeFeed
 
 # 从外部文件加载城市数据
 with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
     data = json.load(f)
 
-# API配置
-id = '10006646'
-key = 'c66af4c46b1b1895c1aee8fa94f2d8a7'
-url = 'https://cn.apihz.cn/api/tianqi/tqyb.php'
+# 区域编码索引
+catalog = RegionCatalog(data)
 
+# 预热快照包路径（由 weather_bundle.py build 生成）
+BUNDLE_PATH = os.environ.get('WEATHER_BUNDLE', '../files/snapshot.wxb')
 
-class WeatherWorker(QThread):
+# 本地缓存代理默认地址（由 weather_daemon.py 提供）
+DEFAULT_DAEMON_URL = 'http://127.0.0.1:8765'
+
+# 告警规则文件和本地告警日志
+ALERT_RULES_PATH = os.environ.get('WEATHER_ALERT_RULES', '../files/alert_rules.txt')
+ALERT_LOG_PATH = os.environ.get('WEATHER_ALERT_LOG', 'weather_alerts.log')
+
+# 天气变化文件，其他程序可从记录的偏移处继续读取
+CHANGE_FEED_PATH = os.environ.get('WEATHER_CHANGE_FEED', 'weather_changes.jsonl')
+
+# 缓存有效期（秒），以及后台提前刷新当前显示数据的时间点
+CACHE_TTL = 600
+REFRESH_AGE = 540
+
+# 天气缓存最多保留的区域数，默认可容纳全部区域（含快照包预热的数据）
+CACHE_MAX_ENTRIES = int(os.environ.get('WEATHER_CACHE_SIZE', 4096))
+
+
+class WeatherCache(OrderedDict):
     """
-    后台工作线程，用于执行网络请求
+    按最近使用淘汰的天气数据缓存，键为区域编码
 
     参数:
-    query_list -- 查询参数列表，每个元素为元组(sheng, place)
+    max_entries -- 最多保留的条目数
     """
-    finished = Signal(dict)  # 成功信号，传递天气数据
-    error = Signal(str)  # 错误信号，传递错误信息
-    progress = Signal(int)  # 进度更新信号
 
-    def __init__(self, query_list):
-        """
-        初始化工作线程
-
-        参数:
-        query_list -- 查询参数列表，每个元素为元组(sheng, place)
-        """
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
         super().__init__()
-        self.query_list = query_list
-        self.canceled = False  # 取消标志
+        self.max_entries = max_entries
 
-    def run(self):
-        """
-        线程执行的主要方法，执行网络请求和数据处理
-        """
-        try:
-            # 模拟进度更新
-            for i in range(1, 101, 10):
-                if self.canceled:
-                    return
-                self.progress.emit(i)
-                time.sleep(0.05)
-
-            last_error = None  # 记录最后一个错误
-
-            # 依次尝试查询列表中的地点
-            for sheng, place in self.query_list:
-                try:
-                    # 构建API URL
-                    url_total = f"{url}?id={id}&key={key}&sheng={sheng}&place={place}"
-
-                    # 发送网络请求，设置10秒超时
-                    response = requests.get(url_total, timeout=10)
-                    response.raise_for_status()  # 检查HTTP错误状态码
-
-                    # 解析JSON响应
-                    weather_data = response.json()
-
-                    # 验证API返回的数据是否有效
-                    if 'place' not in weather_data or 'temperature' not in weather_data:
-                        raise ValueError("API返回无效数据")
-
-                    # 添加时间戳
-                    weather_data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    weather_data['query_level'] = f"{sheng}/{place}"  # 记录查询成功的级别
-
-                    # 发出完成信号
-                    self.finished.emit(weather_data)
-                    return
-
-                except requests.exceptions.RequestException as e:
-                    # 处理网络相关错误
-                    last_error = f"查询 {place} 失败: {str(e)}"
-                except ValueError as e:
-                    # 处理JSON解析错误或无效数据
-                    last_error = f"查询 {place} 失败: {str(e)}"
-                except Exception as e:
-                    # 处理其他未知错误
-                    last_error = f"查询 {place} 失败: {str(e)}"
-
-            # 所有查询都失败，发出错误信号
-            if last_error:
-                self.error.emit(last_error)
-
-        finally:
-            # 确保进度条到达100%
-            self.progress.emit(100)
-
-    def cancel(self):
-        """取消正在进行的请求"""
-        self.canceled = True
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
 
 
 class WeatherApp(QWidget):
@@ -114,7 +80,7 @@ class WeatherApp(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('多级天气查询系统')
-        self.setFixedSize(500, 650)  # 增大窗口尺寸以容纳更多内容
+        self.setFixedSize(500, 760)  # 增大窗口尺寸以容纳更多内容
 
         # 创建主布局
         self.layout_main = QVBoxLayout()
@@ -127,8 +93,16 @@ class WeatherApp(QWidget):
         self.folder_path = '../files/weatherlogo/new_ico/'
         self.weather_icons = self.preload_weather_icons()
 
-        # 初始化天气数据缓存
-        self.weather_cache = {}
+        # 初始化天气数据缓存，并从预热快照包载入
+        self.weather_cache = WeatherCache()
+        self.load_snapshot_bundle()
+
+        # 初始化告警引擎
+        self.alert_engine = self.load_alert_engine()
+        self.alert_log = open_alert_log(ALERT_LOG_PATH)
+
+        # 初始化变化发布，只有天气真正变化时才写入变化文件
+        self.change_feed = ChangeFeed(CHANGE_FEED_PATH)
 
         # 创建UI组件
         self.create_ui_components()
@@ -139,8 +113,17 @@ class WeatherApp(QWidget):
         # 连接信号与槽
         self.connect_signals()
 
-        # 初始化工作线程
-        self.worker = None
+        # 初始化工作线程池，线程在查询之间复用
+        self.worker_pool = WeatherWorkerPool(parent=self)
+        self.current_task = None  # 当前用户查询
+        self.refresh_task = None  # 当前后台刷新
+        self.status_task = None  # 正在读取的本地代理状态
+        self.displayed_cache_key = None  # 当前显示数据的缓存键
+
+        # 定时在后台刷新即将过期的当前显示数据
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_displayed_weather)
+        self.refresh_timer.start(60 * 1000)
 
         # 显示欢迎消息
         self.show_welcome_message()
@@ -227,6 +210,9 @@ class WeatherApp(QWidget):
         # 创建缓存管理区域
         self.create_cache_management()
 
+        # 创建本地代理设置区域
+        self.create_daemon_settings()
+
     def create_location_selection(self):
         """创建位置选择组件"""
         # 位置选择布局
@@ -320,6 +306,16 @@ class WeatherApp(QWidget):
 
         self.layout_main.addLayout(query_info_layout)
 
+        # 上游服务状态标签（熔断器状态）
+        self.service_status_label = QLabel(default_client.status_text())
+        self.service_status_label.setStyleSheet("color: #666666; font-size: 10pt;")
+        self.layout_main.addWidget(self.service_status_label)
+
+        # 定时刷新服务状态，熔断倒计时需要实时更新
+        self.service_status_timer = QTimer(self)
+        self.service_status_timer.timeout.connect(self.update_service_status)
+        self.service_status_timer.start(1000)
+
     def create_weather_icons(self):
         """创建天气图标显示区域"""
         # 图标布局
@@ -403,8 +399,14 @@ class WeatherApp(QWidget):
         self.source_label = QLabel("数据来源: 中国天气网")
         self.source_label.setStyleSheet("color: #666666; font-size: 10pt;")
 
+        # 告警标签
+        self.alert_label = QLabel("告警: 无")
+        self.alert_label.setStyleSheet("color: #666666; font-size: 10pt;")
+        self.alert_label.setWordWrap(True)
+
         additional_layout.addWidget(self.update_time_label)
         additional_layout.addWidget(self.source_label)
+        additional_layout.addWidget(self.alert_label)
 
         self.layout_main.addLayout(additional_layout)
 
@@ -427,6 +429,39 @@ class WeatherApp(QWidget):
 
         self.layout_main.addLayout(cache_layout)
 
+    def create_daemon_settings(self):
+        """创建本地缓存代理设置组件，设置保存在QSettings中"""
+        self.settings = QSettings('SimpleWeather', 'WeatherApp')
+
+        daemon_layout = QHBoxLayout()
+
+        # 是否通过本地代理查询
+        self.daemon_checkbox = QCheckBox("使用本地代理")
+        self.daemon_checkbox.setChecked(self.settings.value('daemon/enabled', False, type=bool))
+
+        # 代理地址
+        self.daemon_url_edit = QLineEdit(self.settings.value('daemon/url', DEFAULT_DAEMON_URL))
+        self.daemon_url_edit.setPlaceholderText(DEFAULT_DAEMON_URL)
+        self.daemon_url_edit.setEnabled(self.daemon_checkbox.isChecked())
+
+        daemon_layout.addWidget(self.daemon_checkbox)
+        daemon_layout.addWidget(self.daemon_url_edit)
+
+        self.layout_main.addLayout(daemon_layout)
+
+    def save_daemon_settings(self):
+        """保存本地代理设置"""
+        self.daemon_url_edit.setEnabled(self.daemon_checkbox.isChecked())
+        self.settings.setValue('daemon/enabled', self.daemon_checkbox.isChecked())
+        self.settings.setValue('daemon/url', self.daemon_url_edit.text().strip())
+        self.update_service_status()
+
+    def daemon_url(self):
+        """获取当前生效的代理地址，未启用时返回None"""
+        if not self.daemon_checkbox.isChecked():
+            return None
+        return self.daemon_url_edit.text().strip() or DEFAULT_DAEMON_URL
+
     def preload_weather_icons(self):
         """预加载天气图标（优化版）"""
         icon_dict = {}
@@ -444,6 +479,21 @@ class WeatherApp(QWidget):
             print(f"加载天气图标时出错: {e}")
         return icon_dict
 
+    def load_snapshot_bundle(self):
+        """从预热快照包载入缓存，包不存在或签名无效时跳过"""
+        if not os.path.exists(BUNDLE_PATH):
+            return
+        key = load_key()
+        if not key:
+            print("未配置快照包签名密钥，跳过预热")
+            return
+        try:
+            with SnapshotBundle(BUNDLE_PATH, key) as bundle:
+                loaded = bundle.load_into(self.weather_cache)
+            print(f"已从快照包载入 {loaded} 条天气数据")
+        except (OSError, BundleError) as e:
+            print(f"加载快照包时出错: {e}")
+
     def connect_signals(self):
         """连接所有信号与槽"""
         # 省市区选择信号
@@ -455,6 +505,10 @@ class WeatherApp(QWidget):
         self.cancel_button.clicked.connect(self.cancel_query)
         self.clear_cache_button.clicked.connect(self.clear_cache)
 
+        # 本地代理设置信号
+        self.daemon_checkbox.toggled.connect(self.save_daemon_settings)
+        self.daemon_url_edit.editingFinished.connect(self.save_daemon_settings)
+
     def weather_info_return(self):
         """处理天气查询请求"""
 
@@ -474,8 +528,8 @@ class WeatherApp(QWidget):
             self.show_dialog("请至少选择省份和城市")
             return
 
-        # 生成缓存键
-        cache_key = f"{sheng}-{city}-{area}"
+        # 生成缓存键（所选区域的编码）
+        cache_key = self.selected_region_code()
 
         # 检查缓存
         if cache_key in self.weather_cache:
@@ -483,29 +537,41 @@ class WeatherApp(QWidget):
             cached_data = self.weather_cache[cache_key]
 
             # 检查缓存是否过期（10分钟内有效）
-            cache_time = datetime.strptime(cached_data['timestamp'], "%Y-%m-%d %H:%M:%S")
-            if (datetime.now() - cache_time).total_seconds() < 600:
+            if cached_data.age() < CACHE_TTL:
+                self.displayed_cache_key = cache_key
                 self.display_weather(cached_data)
-                self.update_time_label.setText(f"更新时间: {cached_data['timestamp']} (缓存)")
-                self.query_level_label.setText(f"查询级别: {cached_data.get('query_level', '缓存')}")
+                self.update_time_label.setText(f"更新时间: {cached_data.timestamp_text} (缓存)")
+                self.query_level_label.setText(f"查询级别: {catalog.describe(cached_data.region_code)}")
                 return
 
+        # 熔断中直接使用过期缓存，不再发起注定失败的请求
+        # 使用本地代理时由代理熔断和降级，不检查本进程的客户端
+        daemon_url = self.daemon_url()
+        if daemon_url is None and not default_client.available():
+            if not self.show_stale_cache(cache_key):
+                if default_client.routes:
+                    self.show_dialog("天气服务暂不可用（熔断中），请稍后再试")
+                else:
+                    self.show_dialog("未配置天气服务商，请检查服务商配置文件或启用本地代理")
+            self.update_service_status()
+            return
+
         # 创建查询列表（按优先级从高到低）
         query_list = []
         query_strategy = []
 
         # 1. 优先尝试县级查询
         if area != '--区域--':
-            query_list.append((sheng, area))
+            query_list.append((sheng, area, catalog.lookup(sheng, city, area)))
             query_strategy.append(f"县级: {area}")
 
         # 2. 尝试市级查询
         if city != '--市区--':
-            query_list.append((sheng, city))
+            query_list.append((sheng, city, catalog.lookup(sheng, city)))
             query_strategy.append(f"市级: {city}")
 
         # 3. 最后尝试省级查询（如果支持）
-        query_list.append((sheng, sheng))
+        query_list.append((sheng, sheng, catalog.lookup(sheng)))
         query_strategy.append(f"省级: {sheng}")
 
         # 更新查询策略显示
@@ -518,36 +584,28 @@ class WeatherApp(QWidget):
         # 显示加载指示器
         self.show_loading_indicator(True)
 
-        # 创建并启动工作线程
-        self.worker = WeatherWorker(query_list)
+        # 提交到线程池，用户查询优先于后台刷新
+        self.current_task = self.worker_pool.submit(query_list, PRIORITY_USER, daemon_url)
 
-        # 连接工作线程信号
-        self.worker.finished.connect(self.handle_weather_data)
-        self.worker.error.connect(self.handle_error)
-        self.worker.progress.connect(self.update_progress)
+        # 连接任务信号
+        self.current_task.signals.finished.connect(self.handle_weather_data)
+        self.current_task.signals.error.connect(self.handle_error)
+        self.current_task.signals.progress.connect(self.update_progress)
+        self.current_task.signals.done.connect(self.cleanup_after_query)
 
-        # 确保线程结束后被清理
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.worker.error.connect(self.worker.deleteLater)
-        self.worker.finished.connect(lambda: self.cleanup_after_query(cache_key))
-        self.worker.error.connect(lambda: self.cleanup_after_query(cache_key))
-
-        # 启动线程
-        self.worker.start()
         self.last_request_time = current_time  # 更新最后请求时间
 
-    def handle_weather_data(self, data):
+    def handle_weather_data(self, data, task):
         """
         处理成功获取的天气数据
 
         参数:
-        data -- 从API获取的天气数据
+        data -- 从API获取的WeatherObservation
+        task -- 完成的QueryTask
         """
-        # 获取缓存键
-        sheng = self.province.currentText()
-        city = self.city.currentText()
-        area = self.area.currentText()
-        cache_key = f"{sheng}-{city}-{area}"
+        # 缓存键取自任务本身，查询期间下拉框可能已改选其他区域
+        cache_key = task.query_list[0][2]
+        self.displayed_cache_key = cache_key
 
         # 更新缓存
         self.weather_cache[cache_key] = data
@@ -556,60 +614,167 @@ class WeatherApp(QWidget):
         # 显示天气信息
         self.display_weather(data)
 
+        if task.stale:
+            # 本地代理的上游不可用，返回的是过期缓存，不发布变化
+            self.update_time_label.setText(f"更新时间: {data.timestamp_text} (过期缓存)")
+            self.query_level_label.setText(f"查询级别: {catalog.describe(data.region_code)} (降级)")
+            return
+
         # 显示更新时间
-        self.update_time_label.setText(f"更新时间: {data['timestamp']}")
+        self.update_time_label.setText(f"更新时间: {data.timestamp_text}")
 
         # 显示查询级别
-        self.query_level_label.setText(f"查询级别: {data.get('query_level', '未知')}")
+        self.query_level_label.setText(f"查询级别: {catalog.describe(data.region_code)}")
+
+        # 评估告警规则并发布变化
+        self.process_alerts(data)
+        self.change_feed.publish(data)
+
+    def load_alert_engine(self):
+        """加载告警规则，规则文件不存在或有误时返回空引擎"""
+        if not os.path.exists(ALERT_RULES_PATH):
+            return AlertEngine()
+        try:
+            return AlertEngine(load_rules(ALERT_RULES_PATH, catalog))
+        except (OSError, ValueError) as e:
+            print(f"加载告警规则时出错: {e}")
+            return AlertEngine()
+
+    def process_alerts(self, data):
+        """
+        用新观测评估告警规则，状态变化写入告警日志并显示最新告警
+
+        每条获取到的观测都要评估，引擎按状态变化触发，重复的观测不会重复告警；
+        告警状态只保存在内存中，只在天气变化时评估会使重启前已满足的条件不再触发
+
+        参数:
+        data -- WeatherObservation
+        """
+        alerts = self.alert_engine.process(data)
+        if not alerts:
+            return
+        for alert in alerts:
+            self.alert_log.info(alert.message(catalog))
+
+        raised = [alert for alert in alerts if alert.raised]
+        active = self.alert_engine.active_count()
+        if raised:
+            self.alert_label.setText(f"告警({active}): {raised[-1].message(catalog)}")
+            self.alert_label.setStyleSheet("color: #cc0000; font-size: 10pt; font-weight: bold;")
+        elif active:
+            self.alert_label.setText(f"告警({active}): {alerts[-1].message(catalog)}")
+        else:
+            self.alert_label.setText("告警: 无")
+            self.alert_label.setStyleSheet("color: #666666; font-size: 10pt;")
+
+    def selected_region_code(self):
+        """获取当前所选最细一级区域的编码"""
+        sheng = self.province.currentText()
+        city = self.city.currentText()
+        area = self.area.currentText()
+        if area != '--区域--':
+            return catalog.lookup(sheng, city, area)
+        return catalog.lookup(sheng, city)
 
     def display_weather(self, data):
         """显示天气信息"""
         # 更新文本信息
-        self.city_label.setText(f"{data['place']}")
-        self.temp_label.setText(f"{data['temperature']}℃")
-        self.weather_label.setText(f"{data['weather1']}转{data['weather2']}")
-        self.humidity_label.setText(f"{data['humidity']}%")
-        self.wind_label.setText(f"{data['windScale']}级 ({data['windSpeed']}m/s)")
+        self.city_label.setText(f"{data.place}")
+        self.temp_label.setText(f"{format_number(data.temperature)}℃")
+        self.weather_label.setText(f"{data.weather1_name}转{data.weather2_name}")
+        self.humidity_label.setText(f"{format_number(data.humidity)}%")
+        self.wind_label.setText(f"{data.wind_scale or '--'}级 ({format_number(data.wind_speed)}m/s)")
 
         # 更新图标
-        weather1 = data['weather1']
-        weather2 = data['weather2']
+        weather1 = data.weather1_name
+        weather2 = data.weather2_name
 
+        # 预加载的图标已缩放为80x80，直接使用，避免每次显示都生成新的QPixmap
         if weather1 in self.weather_icons:
-            self.weather_icon_1.setPixmap(self.weather_icons[weather1].scaled(80, 80, Qt.KeepAspectRatio))
+            self.weather_icon_1.setPixmap(self.weather_icons[weather1])
             self.weather_icon_1.setText("")
         else:
             self.weather_icon_1.setText(f"无{weather1}图标")
 
         if weather2 in self.weather_icons:
-            self.weather_icon_2.setPixmap(self.weather_icons[weather2].scaled(80, 80, Qt.KeepAspectRatio))
+            self.weather_icon_2.setPixmap(self.weather_icons[weather2])
             self.weather_icon_2.setText("")
         else:
             self.weather_icon_2.setText(f"无{weather2}图标")
 
-    def handle_error(self, error_msg):
-        """处理错误"""
+    def handle_error(self, error_msg, task):
+        """
+        处理错误，有过期缓存时优先显示过期数据
+
+        参数:
+        error_msg -- 错误信息
+        task -- 失败的QueryTask，过期缓存按其区域查找
+        """
+        self.update_service_status()
+        if self.show_stale_cache(task.query_list[0][2]):
+            return
         self.show_dialog(error_msg)
         self.query_level_label.setText("查询级别: 失败")
 
+    def show_stale_cache(self, cache_key):
+        """
+        显示过期的缓存数据，没有缓存时返回False
+
+        参数:
+        cache_key -- 缓存键（区域编码）
+        """
+        cached_data = self.weather_cache.get(cache_key)
+        if cached_data is None:
+            return False
+        self.display_weather(cached_data)
+        self.update_time_label.setText(f"更新时间: {cached_data.timestamp_text} (过期缓存)")
+        self.query_level_label.setText(f"查询级别: {catalog.describe(cached_data.region_code)} (降级)")
+        return True
+
+    def update_service_status(self):
+        """更新上游服务状态显示，使用本地代理时显示代理的上游状态"""
+        daemon_url = self.daemon_url()
+        if daemon_url is None:
+            self.service_status_label.setText(default_client.status_text())
+            return
+        # 在线程池中读取代理状态，不阻塞界面，同一时间只读取一次
+        if self.status_task is not None:
+            return
+        self.status_task = self.worker_pool.submit_status(daemon_url)
+        self.status_task.signals.finished.connect(self.handle_daemon_status)
+        self.status_task.signals.error.connect(self.handle_daemon_status_error)
+        self.status_task.signals.done.connect(self.cleanup_after_status)
+
+    def handle_daemon_status(self, text, task):
+        """显示本地代理状态"""
+        if self.daemon_url() is not None:
+            self.service_status_label.setText(text)
+
+    def handle_daemon_status_error(self, error_msg, task):
+        """本地代理无法连接"""
+        if self.daemon_url() is not None:
+            self.service_status_label.setText("服务状态: 本地代理无法连接")
+
+    def cleanup_after_status(self, task):
+        """读取代理状态结束"""
+        if task is self.status_task:
+            self.status_task = None
+
     def update_progress(self, value):
         """更新进度条"""
         self.progress_bar.setValue(value)
         self.progress_bar.setFormat(f"加载中... {value}%")
 
-    def cleanup_after_query(self, cache_key):
-        """查询结束后的清理工作"""
+    def cleanup_after_query(self, task):
+        """
+        查询结束后的清理工作
 
-        if self.worker:
-            try:
-                if self.worker.isRunning():
-                    self.worker.quit()
-                    self.worker.wait(2000)  # 等待2秒
-                self.worker.deleteLater()
-            except Exception as e:
-                print(f"清理线程时出错: {e}")
-            finally:
-                self.worker = None
+        参数:
+        task -- 结束的QueryTask，已被新查询取代的任务不做处理
+        """
+        if task is not self.current_task:
+            return
+        self.current_task = None
 
         # 隐藏加载指示器
         self.show_loading_indicator(False)
@@ -618,16 +783,58 @@ class WeatherApp(QWidget):
         self.query_button.setEnabled(True)
         self.cancel_button.setEnabled(False)
 
-        # 重置工作线程引用
-        self.worker = None
-
     def cancel_query(self):
-        """取消正在进行的查询"""
-        if self.worker:
-            self.worker.cancel()
-            self.show_dialog("查询已取消")
-            self.cleanup_after_query(None)
+        """取消正在进行的查询，中止其网络请求并立即释放线程"""
+        if self.current_task:
+            self.worker_pool.cancel(self.current_task)
+            self.cleanup_after_query(self.current_task)
             self.query_level_label.setText("查询级别: 已取消")
+            self.show_dialog("查询已取消")
+
+    def refresh_displayed_weather(self):
+        """在后台刷新即将过期的当前显示数据"""
+        cache_key = self.displayed_cache_key
+        cached_data = self.weather_cache.get(cache_key)
+        if cached_data is None or cached_data.age() < REFRESH_AGE:
+            return
+        daemon_url = self.daemon_url()
+        if self.refresh_task is not None or (daemon_url is None and not default_client.available()):
+            return
+
+        self.refresh_task = self.worker_pool.submit(catalog.query_list(cache_key), PRIORITY_REFRESH, daemon_url)
+        self.refresh_task.signals.finished.connect(self.handle_refreshed_data)
+        self.refresh_task.signals.done.connect(self.cleanup_after_refresh)
+
+    def handle_refreshed_data(self, data, task):
+        """
+        处理后台刷新得到的数据，仍在显示该区域时更新界面
+
+        参数:
+        data -- WeatherObservation
+        task -- 完成的刷新QueryTask
+        """
+        if task.stale:
+            # 代理返回的是过期缓存，没有新数据
+            return
+        refreshed_key = task.query_list[0][2]
+        self.weather_cache[refreshed_key] = data
+        self.update_cache_status()
+        self.process_alerts(data)
+        self.change_feed.publish(data)
+        if self.displayed_cache_key == refreshed_key and self.current_task is None:
+            self.display_weather(data)
+            self.update_time_label.setText(f"更新时间: {data.timestamp_text}")
+
+    def cleanup_after_refresh(self, task):
+        """后台刷新结束"""
+        if task is self.refresh_task:
+            self.refresh_task = None
+
+    def closeEvent(self, event):
+        """关闭窗口时取消所有任务"""
+        self.worker_pool.shutdown()
+        self.change_feed.close()
+        super().closeEvent(event)
 
     def clear_cache(self):
         """清除天气数据缓存"""
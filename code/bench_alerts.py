@@ -0,0 +1,119 @@
+"""
+告警引擎吞吐基准
+
+随机生成大量规则（全国/省级/市级作用域），对全目录观测连续执行多轮扫描，
+比较索引引擎与逐条检查全部规则的朴素做法每秒能处理的观测数，
+并逐条核对两者匹配的规则一致，不一致时以非零状态退出。
+
+用法:
+python bench_alerts.py --rules 2000 --sweeps 5
+"""
+import argparse
+import json
+import operator
+import random
+import sys
+import time
+
+from weather_alerts import AlertEngine, AlertRule, CONDITION_FIELDS, NATIONWIDE
+from weather_record import (
+    RegionCatalog, WeatherObservation, LEVEL_AREA, ancestor_codes, region_level,
+)
+
+CONDITIONS = ['晴', '多云', '阴', '小雨', '中雨', '大雨', '暴雨', '大暴雨', '特大暴雨', '雷阵雨', '小雪', '雾', '霾']
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+
+def random_rules(catalog, count, rng):
+    """生成随机规则"""
+    scopes = [NATIONWIDE] + [code for code in catalog if region_level(code) != LEVEL_AREA]
+    rules = []
+    for i in range(count):
+        scope = rng.choice(scopes)
+        if rng.random() < 0.3:
+            field = rng.choice(CONDITION_FIELDS)
+            rules.append(AlertRule(f"规则{i}", field, 'in', frozenset(rng.sample(CONDITIONS, 3)), scope))
+        else:
+            field, low, high = rng.choice([('temperature', -20, 40), ('humidity', 0, 100), ('wind_speed', 0, 25)])
+            rules.append(AlertRule(f"规则{i}", field, rng.choice(list(OPERATORS)), rng.uniform(low, high), scope))
+    return rules
+
+
+def random_sweep(catalog, rng):
+    """为全目录生成一轮观测"""
+    return [WeatherObservation.from_response({
+        'place': catalog.name(code),
+        'temperature': f"{rng.uniform(-20, 40):.1f}",
+        'humidity': str(rng.randint(0, 100)),
+        'windSpeed': f"{rng.uniform(0, 25):.1f}",
+        'weather1': rng.choice(CONDITIONS),
+        'weather2': rng.choice(CONDITIONS),
+    }, code) for code in catalog]
+
+
+def naive_matches(rules, observation):
+    """朴素做法: 逐条检查全部规则"""
+    scopes = set(ancestor_codes(observation.region_code)) | {NATIONWIDE}
+    matched = set()
+    for rule in rules:
+        if rule.scope not in scopes:
+            continue
+        if rule.field in CONDITION_FIELDS:
+            name = observation.weather1_name if rule.field == 'weather1' else observation.weather2_name
+            if name in rule.value:
+                matched.add(rule.id)
+        elif OPERATORS[rule.op](getattr(observation, rule.field), rule.value):
+            matched.add(rule.id)
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='告警引擎吞吐基准')
+    parser.add_argument('--rules', type=int, default=2000, help='规则数量')
+    parser.add_argument('--sweeps', type=int, default=5, help='全目录扫描轮数')
+    args = parser.parse_args()
+
+    with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+        catalog = RegionCatalog(json.load(f))
+    rng = random.Random(0)
+    engine = AlertEngine(random_rules(catalog, args.rules, rng))
+    sweeps = [random_sweep(catalog, rng) for _ in range(args.sweeps)]
+    total = sum(len(sweep) for sweep in sweeps)
+
+    start = time.perf_counter()
+    alerts = 0
+    for sweep in sweeps:
+        for observation in sweep:
+            alerts += len(engine.process(observation))
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = []
+    for sweep in sweeps:
+        for observation in sweep:
+            expected.append(naive_matches(engine.rules, observation))
+    naive = time.perf_counter() - start
+
+    # 重新编译以清空状态，逐条核对处理后正在触发的规则与朴素做法一致
+    engine.compile(engine.rules)
+    mismatches = 0
+    observations = (observation for sweep in sweeps for observation in sweep)
+    for observation, matched in zip(observations, expected):
+        engine.process(observation)
+        if engine.active.get(observation.region_code, set()) != matched:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"不一致: {catalog.describe(observation.region_code)} "
+                      f"索引 {sorted(engine.active.get(observation.region_code, ()))}，朴素 {sorted(matched)}")
+
+    print(f"规则: {args.rules}，观测: {total}（{args.sweeps} 轮全目录），告警状态变化: {alerts}")
+    print(f"索引引擎: {total / indexed:,.0f} 条/秒，单轮全目录 {indexed / args.sweeps * 1000:.1f}ms")
+    print(f"朴素扫描: {total / naive:,.0f} 条/秒，单轮全目录 {naive / args.sweeps * 1000:.1f}ms")
+    if mismatches:
+        print(f"失败: {mismatches} 条观测的匹配结果与朴素做法不一致")
+        sys.exit(1)
+    print("结果一致: 索引引擎与朴素做法匹配的规则完全相同")
+
+
+if __name__ == '__main__':
+    main()
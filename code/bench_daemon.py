@@ -0,0 +1,104 @@
+"""
+本地代理并发基准
+
+在子进程中启动一个预先填满缓存的 WeatherDaemon（不访问上游），
+由大量并发客户端保持连接反复查询，统计缓存命中的响应延迟。
+--interval 为每个客户端两次请求之间的间隔，设为0即为饱和压测。
+客户端与代理分属不同进程，避免两者争用同一个GIL。
+
+用法:
+python bench_daemon.py --clients 200 --requests 100 --interval 0.2
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import threading
+import time
+
+from weather_daemon import WeatherDaemon
+from weather_record import RegionCatalog, WeatherObservation
+
+
+def fill_cache(server, catalog):
+    """为每个区域写入一条新鲜的缓存记录"""
+    cache = server.cache
+    for code in catalog:
+        observation = WeatherObservation.from_response(
+            {'place': catalog.name(code), 'temperature': '20', 'humidity': '50',
+             'windScale': '3', 'windSpeed': '2.0', 'weather1': '晴', 'weather2': '多云'}, code)
+        cache.entries[code] = (observation, cache._encode(observation))
+
+
+def serve(catalog, port_queue):
+    """子进程: 启动代理并回报端口"""
+    server = WeatherDaemon(catalog, port=0)
+    fill_cache(server, catalog)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def run_client(port, codes, count, interval, latencies, barrier):
+    """单个客户端: 保持一个连接，每隔interval秒发送一个请求，共count个"""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    rng = random.Random()
+    samples = []
+    barrier.wait()
+    # 错开各客户端的起始时间
+    time.sleep(rng.uniform(0, interval))
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request('GET', f"/weather?code={rng.choice(codes)}")
+        response = connection.getresponse()
+        response.read()
+        samples.append(time.perf_counter() - start)
+        if response.status != 200:
+            raise RuntimeError(f"代理返回 {response.status}")
+        time.sleep(interval)
+    connection.close()
+    latencies.extend(samples)
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地代理并发基准')
+    parser.add_argument('--clients', type=int, default=200, help='并发客户端数')
+    parser.add_argument('--requests', type=int, default=100, help='每个客户端的请求数')
+    parser.add_argument('--interval', type=float, default=0.2, help='每个客户端的请求间隔（秒）')
+    args = parser.parse_args()
+
+    with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+        catalog = RegionCatalog(json.load(f))
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(catalog, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get()
+
+    codes = list(catalog)
+    latencies = []
+    barrier = threading.Barrier(args.clients + 1)
+    clients = [threading.Thread(target=run_client, args=(port, codes, args.requests, args.interval, latencies, barrier))
+               for _ in range(args.clients)]
+    for client in clients:
+        client.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    server.terminate()
+
+    latencies.sort()
+    print(f"客户端: {args.clients}，请求总数: {len(latencies)}，耗时 {elapsed:.2f}s，"
+          f"吞吐 {len(latencies) / elapsed:.0f} 次/秒")
+    for p in (50, 90, 99):
+        print(f"p{p}: {percentile(latencies, p) * 1000:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
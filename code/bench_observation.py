@@ -0,0 +1,95 @@
+"""
+观测记录内存基准
+
+为城市数据中的全部区域模拟一次API响应，分别以原始字典形式
+（附加 timestamp / query_level 字符串）和 WeatherObservation 形式保存，
+比较常驻内存、分配块数和解析耗时。
+
+用法:
+python bench_observation.py
+"""
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from weather_record import RegionCatalog, WeatherObservation
+
+CONDITIONS = ['晴', '多云', '阴', '小雨', '中雨', '大雨', '暴雨', '雷阵雨', '小雪', '雾', '霾']
+
+
+def simulate_responses(catalog, seed=0):
+    """为每个区域生成与API格式一致的JSON文本"""
+    rng = random.Random(seed)
+    responses = []
+    for code in catalog:
+        payload = {
+            'code': 200,
+            'place': catalog.name(code),
+            'temperature': f"{rng.uniform(-20, 40):.1f}",
+            'humidity': str(rng.randint(10, 100)),
+            'windScale': str(rng.randint(0, 8)),
+            'windSpeed': f"{rng.uniform(0, 20):.1f}",
+            'weather1': rng.choice(CONDITIONS),
+            'weather2': rng.choice(CONDITIONS),
+        }
+        responses.append((code, json.dumps(payload, ensure_ascii=False)))
+    return responses
+
+
+def hold_dicts(catalog, responses):
+    """原始做法: 保存 response.json() 字典并附加字符串字段"""
+    cache = {}
+    for code, text in responses:
+        weather_data = json.loads(text)
+        weather_data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        weather_data['query_level'] = catalog.describe(code)
+        cache[code] = weather_data
+    return cache
+
+
+def hold_records(catalog, responses):
+    """新做法: 解析一次后只保存 WeatherObservation"""
+    cache = {}
+    for code, text in responses:
+        cache[code] = WeatherObservation.from_response(json.loads(text), code)
+    return cache
+
+
+def measure(builder, catalog, responses):
+    """测量构建缓存后的常驻内存、分配块数和耗时"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    cache = builder(catalog, responses)
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.statistics('filename')
+    size = sum(stat.size for stat in stats)
+    blocks = sum(stat.count for stat in stats)
+    return len(cache), size, blocks, elapsed
+
+
+def main():
+    with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+        catalog = RegionCatalog(json.load(f))
+    responses = simulate_responses(catalog)
+
+    # 预先登记天气现象编码，避免计入首次登记的开销
+    hold_records(catalog, responses[:len(CONDITIONS) * 4])
+
+    print(f"区域数量: {len(catalog)}")
+    print(f"{'形式':<10}{'条目':>8}{'常驻内存(KB)':>16}{'分配块数':>12}{'每条字节':>10}{'耗时(ms)':>10}")
+    results = {}
+    for label, builder in (('dict', hold_dicts), ('record', hold_records)):
+        count, size, blocks, elapsed = measure(builder, catalog, responses)
+        results[label] = size
+        print(f"{label:<10}{count:>8}{size / 1024:>16.1f}{blocks:>12}{size / count:>10.0f}{elapsed * 1000:>10.1f}")
+    print(f"内存节省: {1 - results['record'] / results['dict']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
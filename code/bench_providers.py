@@ -0,0 +1,89 @@
+"""
+多服务商路由演示与基准
+
+启动三个本地模拟服务商（快、慢、不稳定，响应格式各不相同），
+分阶段发起查询并统计各服务商承担的请求数和查询耗时:
+1. 正常: 请求应集中到耗时最低的服务商
+2. 最快的服务商宕机: 熔断后请求转移到其余服务商
+3. 恢复: 熔断冷却后探测成功，请求回到最快的服务商
+4. 配额: 最快的服务商每秒配额耗尽后，超出部分由其他服务商承担
+
+用法:
+python bench_providers.py --queries 200
+"""
+import argparse
+import json
+import time
+
+import requests
+
+from weather_client import WeatherClient
+from weather_providers import Provider, Quota
+from weather_record import RegionCatalog
+from weather_stub import StubProvider
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def run_phase(title, client, stubs, query_lists, session):
+    """依次执行查询，打印各服务商承担的请求数和耗时分位"""
+    before = {name: stub.requests for name, stub in stubs.items()}
+    latencies = []
+    failed = 0
+    for query_list in query_lists:
+        start = time.perf_counter()
+        try:
+            client.query_with_fallback(query_list, session=session)
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    share = ', '.join(f"{name} {stub.requests - before[name]}" for name, stub in stubs.items())
+    print(f"[{title}] 查询 {len(query_lists)} 次，失败 {failed}，"
+          f"p50 {percentile(latencies, 50) * 1000:.1f}ms，p99 {percentile(latencies, 99) * 1000:.1f}ms；"
+          f"服务商请求数: {share}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多服务商路由演示与基准')
+    parser.add_argument('--queries', type=int, default=200, help='每个阶段的查询次数')
+    args = parser.parse_args()
+
+    with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+        catalog = RegionCatalog(json.load(f))
+    codes = list(catalog)
+    query_lists = [catalog.query_list(codes[i * 7 % len(codes)]) for i in range(args.queries)]
+
+    stubs = {
+        'fast': StubProvider('apihz', latency=0.005).start(),
+        'slow': StubProvider('nested', latency=0.03).start(),
+        'flaky': StubProvider('nested', latency=0.01, failure_rate=0.3).start(),
+    }
+    client = WeatherClient([Provider.from_config(stub.provider_config(name)) for name, stub in stubs.items()])
+    for route in client.routes:
+        route.breaker.reset_timeout = 1
+    session = requests.Session()
+
+    try:
+        run_phase('正常', client, stubs, query_lists, session)
+
+        stubs['fast'].failure_rate = 1.0
+        run_phase('fast宕机', client, stubs, query_lists, session)
+
+        stubs['fast'].failure_rate = 0.0
+        time.sleep(1.1)
+        run_phase('fast恢复', client, stubs, query_lists, session)
+
+        client.routes[0].provider.quota = Quota(per_second=20, burst=20)
+        run_phase('fast配额20次/秒', client, stubs, query_lists, session)
+
+        print(client.status_text())
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+GUI长时间运行（浸泡）测试
+
+在无界面（offscreen）Qt平台上创建主窗口，通过界面的查询入口向子进程中的
+本地模拟服务商（weather_stub.py）连续发起数千次查询，定期记录常驻内存、
+Python对象数、窗口子对象数、线程数以及每次查询的耗时。
+
+预热阶段结束时记录基线，结束时与基线比较，增长或p99耗时超过预算时
+以非零状态退出，可用于持续集成或在发布前检查内存缓慢增长的问题。
+
+用法:
+python bench_soak.py --queries 5000 --cache-size 256 --csv soak.csv
+
+注意: PySide6 6.12 在 Python 3.11 上每调用一次无返回值的Qt方法都会少计一次
+None 的引用，几百次查询后解释器即因 none_dealloc/bool_dealloc 中止（SIGABRT），
+默认的查询数无法跑完。检测到这一组合时程序直接退出并提示，请使用 Python 3.12
+及以上版本运行。测试结果输出后以 os._exit() 结束进程，跳过Qt和解释器的退出清理。
+"""
+import argparse
+import csv
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+import PySide6
+from PySide6.QtCore import QObject, QSettings, QTimer
+
+
+def serve_stub(latency, failure_rate, port_queue):
+    """子进程: 启动模拟服务商并回报地址，父进程退出后随之退出"""
+    from weather_stub import StubProvider
+    stub = StubProvider('apihz', latency, failure_rate)
+    parent = os.getppid()
+
+    def watch_parent():
+        # 父进程被强制结束时不会清理守护子进程，父进程号变化后关闭服务
+        while os.getppid() == parent:
+            time.sleep(1)
+        stub.shutdown()
+
+    threading.Thread(target=watch_parent, daemon=True).start()
+    port_queue.put(stub.url)
+    stub.serve_forever()
+
+
+def read_proc_status():
+    """从 /proc/self/status 读取常驻内存（KB）和系统线程数，不支持时返回 (None, None)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    return int(fields['VmRSS'].split()[0]), int(fields['Threads'])
+
+
+def take_sample(window, query_count, elapsed):
+    """记录一次资源使用快照"""
+    gc.collect()
+    rss_kb, os_threads = read_proc_status()
+    return {
+        'queries': query_count,
+        'elapsed': round(elapsed, 2),
+        'rss_kb': rss_kb,
+        'gc_objects': len(gc.get_objects()),
+        'qt_children': len(window.findChildren(QObject)),
+        'py_threads': threading.active_count(),
+        'os_threads': os_threads,
+        'cache_entries': len(window.weather_cache),
+    }
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def select_region(window, catalog, code):
+    """像用户一样在下拉框中依次选择省、市、区"""
+    names = [catalog.name(level_code) for level_code in reversed([entry[2] for entry in catalog.query_list(code)])]
+    window.province.setCurrentText(names[0])
+    window.city.setCurrentText(names[1] if len(names) > 1 else '--市区--')
+    window.area.setCurrentText(names[2] if len(names) > 2 else '--区域--')
+
+
+class SoakDriver:
+    """
+    在Qt事件循环中逐个发起查询
+
+    整个测试只调用一次 app.exec()，由任务结束信号和定时器推进下一次查询，
+    与真实运行时相同，不在循环中反复调用 processEvents。
+
+    参数:
+    app -- QApplication
+    window -- WeatherApp
+    catalog -- RegionCatalog
+    codes -- 可供随机选择的区域编码
+    args -- 命令行参数
+    """
+
+    def __init__(self, app, window, catalog, codes, args):
+        self.app = app
+        self.window = window
+        self.catalog = catalog
+        self.codes = codes
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.index = 0
+        self.started_at = 0.0
+        self.start = time.perf_counter()
+        self.samples = []
+        self.latencies = []
+        self.baseline = None
+        self.error = None
+        # 单次查询超时后取消，避免测试卡住
+        self.watchdog = QTimer()
+        self.watchdog.setSingleShot(True)
+        self.watchdog.timeout.connect(window.cancel_query)
+
+    def next_query(self):
+        """发起下一次查询，全部完成后退出事件循环"""
+        if self.index >= self.args.queries:
+            self.app.quit()
+            return
+        self.index += 1
+        try:
+            select_region(self.window, self.catalog, self.rng.choice(self.codes))
+            self.started_at = time.perf_counter()
+            self.window.weather_info_return()
+        except Exception as e:
+            self.error = e
+            self.app.quit()
+            return
+        task = self.window.current_task
+        if task is None:
+            # 命中缓存或被拒绝，查询已同步完成
+            self.query_done(None)
+        else:
+            task.signals.done.connect(self.query_done)
+            self.watchdog.start(int(self.args.query_timeout * 1000))
+
+    def query_done(self, task):
+        self.watchdog.stop()
+        if self.index > self.args.warmup:
+            self.latencies.append(time.perf_counter() - self.started_at)
+        args = self.args
+        if self.index == args.warmup or self.index % args.sample_every == 0 or self.index == args.queries:
+            sample = take_sample(self.window, self.index, time.perf_counter() - self.start)
+            self.samples.append(sample)
+            if self.index == args.warmup:
+                self.baseline = sample
+            print(f"[{self.index}/{args.queries}] 内存 {sample['rss_kb'] or 0:.0f}KB，对象 {sample['gc_objects']}，"
+                  f"窗口子对象 {sample['qt_children']}，线程 {sample['py_threads']}/{sample['os_threads']}，"
+                  f"缓存 {sample['cache_entries']} 项", flush=True)
+        # 回到事件循环后再发起下一次查询，让界面完成本次的清理
+        QTimer.singleShot(0, self.next_query)
+
+
+def check_budgets(args, baseline, final, latencies):
+    """比较基线与结束时的快照，返回超出预算的说明列表"""
+    failures = []
+    if baseline['rss_kb'] is not None:
+        growth = (final['rss_kb'] - baseline['rss_kb']) / 1024
+        if growth > args.max_rss_growth:
+            failures.append(f"常驻内存增长 {growth:.1f}MB，超过预算 {args.max_rss_growth}MB")
+    growth = final['gc_objects'] - baseline['gc_objects']
+    if growth > args.max_object_growth:
+        failures.append(f"Python对象增长 {growth}，超过预算 {args.max_object_growth}")
+    growth = final['qt_children'] - baseline['qt_children']
+    if growth > 0:
+        failures.append(f"窗口子对象增长 {growth}，存在未释放的Qt对象")
+    for name in ('py_threads', 'os_threads'):
+        if final[name] is not None and final[name] - baseline[name] > args.max_thread_growth:
+            failures.append(f"线程数（{name}）从 {baseline[name]} 增长到 {final[name]}，"
+                            f"超过预算 {args.max_thread_growth}")
+    p99 = percentile(latencies, 99) * 1000
+    if p99 > args.max_p99:
+        failures.append(f"查询耗时p99 {p99:.1f}ms，超过预算 {args.max_p99}ms")
+    return failures
+
+
+def unsupported_runtime():
+    """当前Python与PySide6的组合无法完成长时间运行时返回说明，否则返回None"""
+    if sys.version_info < (3, 12) and tuple(PySide6.__version_info__[:2]) == (6, 12):
+        return (f"PySide6 {PySide6.__version__} 在 Python {sys.version.split()[0]} 上存在 None 引用计数错误，"
+                f"几百次查询后进程会中止，请使用 Python 3.12 及以上版本运行")
+    return None
+
+
+def main():
+    """运行测试，返回退出状态"""
+    parser = argparse.ArgumentParser(description='GUI长时间运行（浸泡）测试')
+    parser.add_argument('--queries', type=int, default=3000, help='查询总数')
+    parser.add_argument('--warmup', type=int, default=300, help='预热查询数，结束后记录基线')
+    parser.add_argument('--sample-every', type=int, default=250, help='每隔多少次查询记录一次快照')
+    parser.add_argument('--cache-size', type=int, default=256, help='天气缓存容量，小于区域数以触发淘汰')
+    parser.add_argument('--stub-latency', type=float, default=0.005, help='模拟服务商响应延迟（秒）')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='模拟服务商失败率')
+    parser.add_argument('--seed', type=int, default=1, help='查询区域的随机种子')
+    parser.add_argument('--query-timeout', type=float, default=30.0, help='单次查询最长等待（秒）')
+    parser.add_argument('--max-rss-growth', type=float, default=20.0, help='常驻内存增长预算（MB）')
+    parser.add_argument('--max-object-growth', type=int, default=20000, help='Python对象增长预算')
+    parser.add_argument('--max-thread-growth', type=int, default=0, help='线程数增长预算')
+    parser.add_argument('--max-p99', type=float, default=250.0, help='查询耗时p99预算（毫秒）')
+    parser.add_argument('--csv', help='将快照写入CSV文件')
+    args = parser.parse_args()
+
+    # 在创建任何Qt对象之前检查，避免运行到一半中止
+    reason = unsupported_runtime()
+    if reason:
+        print(f"无法运行: {reason}")
+        return 3
+
+    # 模拟服务商运行在子进程中，其线程不计入本进程
+    port_queue = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve_stub, args=(args.stub_latency, args.failure_rate, port_queue),
+                                   daemon=True)
+    stub.start()
+    stub_url = port_queue.get()
+
+    # 在导入主程序前把服务商配置、告警日志和变化文件指向临时目录
+    workdir = tempfile.mkdtemp(prefix='weather_soak_')
+    providers_path = os.path.join(workdir, 'providers.json')
+    with open(providers_path, 'w', encoding='utf-8') as f:
+        json.dump({'providers': [{'name': 'stub', 'url': stub_url}]}, f)
+    os.environ['WEATHER_PROVIDERS'] = providers_path
+    os.environ['WEATHER_ALERT_LOG'] = os.path.join(workdir, 'alerts.log')
+    os.environ['WEATHER_CHANGE_FEED'] = os.path.join(workdir, 'changes.jsonl')
+    os.environ['WEATHER_BUNDLE'] = os.path.join(workdir, 'missing.wxb')
+    os.environ['WEATHER_CACHE_SIZE'] = str(args.cache_size)
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from PySide6.QtWidgets import QApplication
+    import AIweatherAPP_API as weather_app
+
+    # 界面设置写入临时目录，不影响本机的真实设置（且不经过本地代理）
+    QSettings.setPath(QSettings.NativeFormat, QSettings.UserScope, workdir)
+    app = QApplication(sys.argv)
+    window = weather_app.WeatherApp()
+    window.MIN_REQUEST_INTERVAL = 0
+    dialogs = []
+    window.show_dialog = dialogs.append
+    window.show()
+
+    catalog = weather_app.catalog
+    # 只查询市级和县级区域，界面要求至少选择到城市
+    codes = [code for code in catalog if len(catalog.query_list(code)) > 1]
+
+    driver = SoakDriver(app, window, catalog, codes, args)
+    QTimer.singleShot(0, driver.next_query)
+    try:
+        app.exec()
+    finally:
+        window.close()
+        stub.terminate()
+        stub.join()
+    if driver.error is not None:
+        raise driver.error
+    samples, latencies, baseline = driver.samples, driver.latencies, driver.baseline
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0]))
+            writer.writeheader()
+            writer.writerows(samples)
+
+    if baseline is None or not latencies:
+        print("查询数不足，无法比较基线（--queries 需大于 --warmup）")
+        return 2
+
+    latencies.sort()
+    print(f"查询 {args.queries} 次，弹窗 {len(dialogs)} 次，耗时 p50 {percentile(latencies, 50) * 1000:.1f}ms，"
+          f"p99 {percentile(latencies, 99) * 1000:.1f}ms，最大 {latencies[-1] * 1000:.1f}ms")
+
+    failures = check_budgets(args, baseline, samples[-1], latencies)
+    for failure in failures:
+        print(f"失败: {failure}")
+    if failures:
+        return 1
+    print("通过: 各项增长和耗时均在预算内")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        code = main()
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    # 输出结果后直接结束进程，跳过Qt和解释器的退出清理
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
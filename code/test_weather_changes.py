@@ -0,0 +1,59 @@
+"""
+weather_changes 的变化文件恢复与分段测试
+
+在 code 目录下运行: python -m pytest -q
+"""
+from weather_changes import ChangeFeed, list_segments, read_changes
+from weather_record import WeatherObservation
+
+REGIONS = (10100, 10200, 10300)
+
+
+def observation(code, temperature):
+    return WeatherObservation.from_response({'place': '测试', 'temperature': str(temperature), 'weather1': '晴'}, code)
+
+
+def test_consumer_crosses_segments(tmp_path):
+    # 每次发布后从保存的偏移继续读取，新建分段前后都不能漏读或重复
+    path = str(tmp_path / 'changes.jsonl')
+    feed = ChangeFeed(path, compact_bytes=4000)
+    offset, seen = 0, []
+    for i in range(60):
+        feed.publish(observation(REGIONS[i % 3], i))
+        for offset, record in read_changes(path, offset):
+            seen.append(record['seq'])
+    assert len(list_segments(path)) == 2 and list_segments(path)[-1] > 1
+    assert seen == list(range(1, 61))
+    feed.close()
+
+
+def test_lagging_consumer_restarts_from_snapshot(tmp_path):
+    # 偏移所在的段已被清理时从最早的段读取，快照包含各区域的最新值
+    path = str(tmp_path / 'changes.jsonl')
+    feed = ChangeFeed(path, compact_bytes=4000)
+    feed.publish(observation(REGIONS[0], 0))
+    offset, _ = next(read_changes(path))
+    for i in range(1, 200):
+        feed.publish(observation(REGIONS[i % 3], i))
+    latest = {}
+    for offset, record in read_changes(path, offset):
+        latest[record['region_code']] = record['observation']['temperature']
+    assert latest == {code: feed.last[code].temperature for code in REGIONS}
+    feed.close()
+
+
+def test_restore_after_torn_write_and_segments(tmp_path):
+    path = str(tmp_path / 'changes.jsonl')
+    feed = ChangeFeed(path, compact_bytes=4000)
+    for i in range(100):
+        feed.publish(observation(REGIONS[i % 3], i))
+    feed.close()
+    segment = list_segments(path)[-1]
+    with open(f"{path}.{segment}", 'a', encoding='utf-8') as f:
+        f.write('{"seq": 101, "region_co')
+    feed = ChangeFeed(path, compact_bytes=4000)
+    assert feed.seq == 100
+    assert {code: obs.temperature for code, obs in feed.last.items()} == {10100: 99.0, 10200: 97.0, 10300: 98.0}
+    feed.publish(observation(REGIONS[0], 1000))
+    feed.close()
+    assert ChangeFeed(path).seq == 101
@@ -0,0 +1,82 @@
+"""
+weather_client 的自适应超时和熔断恢复测试
+
+在 code 目录下运行: python -m pytest -q
+"""
+import time
+
+import pytest
+import requests
+
+from weather_client import CircuitBreaker, LatencyTracker, WeatherClient, WeatherQueryError
+from weather_providers import Provider
+from weather_stub import StubProvider
+
+QUERY = ('广东省', '广州市', 190100)
+
+
+@pytest.fixture
+def stub():
+    stub = StubProvider('apihz', latency=0.005).start()
+    yield stub
+    stub.stop()
+
+
+def make_client(stub, reset_timeout=30):
+    client = WeatherClient([Provider.from_config(stub.provider_config('stub'))])
+    route = client.routes[0]
+    route.latency = LatencyTracker(min_samples=5, min_timeout=0.05, max_timeout=2.0)
+    route.breaker = CircuitBreaker(reset_timeout=reset_timeout)
+    return client, route
+
+
+def run_queries(client, session, count):
+    succeeded = 0
+    for _ in range(count):
+        try:
+            client.fetch_observation(*QUERY, session=session)
+            succeeded += 1
+        except WeatherQueryError:
+            pass
+    return succeeded
+
+
+def test_timeout_backs_off_and_recovers():
+    tracker = LatencyTracker(min_samples=1, min_timeout=0.05, max_timeout=2.0)
+    tracker.record(0.01)
+    assert tracker.timeout() == 0.05
+    tracker.record_timeout(0.05)
+    assert tracker.timeout() == pytest.approx(0.1)
+    for _ in range(10):
+        tracker.record_timeout(tracker.timeout())
+    assert tracker.timeout() == 2.0
+    # 成功的耗时回落后退避下限随之缩小
+    tracker.record(0.01)
+    assert tracker.timeout() == 0.05
+
+
+def test_slowed_provider_is_not_locked_out(stub):
+    # 学到很短的超时后服务商整体变慢，超时应随之增大而不是持续失败
+    client, route = make_client(stub)
+    session = requests.Session()
+    assert run_queries(client, session, 10) == 10
+    learned = route.latency.timeout()
+    stub.latency = learned * 1.6
+    succeeded = run_queries(client, session, 10)
+    assert succeeded >= 8
+    assert route.latency.timeout() > learned
+    assert route.breaker.current_state() == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_uses_max_timeout(stub):
+    # 熔断后的探测不受学到的短超时限制，服务商变慢但可用时能恢复
+    client, route = make_client(stub, reset_timeout=0.1)
+    session = requests.Session()
+    run_queries(client, session, 10)
+    stub.latency = 0.2
+    for _ in range(route.breaker.failure_threshold):
+        route.breaker.record_failure()
+    assert route.breaker.current_state() == CircuitBreaker.OPEN
+    time.sleep(0.15)
+    client.fetch_observation(*QUERY, session=session)
+    assert route.breaker.current_state() == CircuitBreaker.CLOSED
@@ -7,16 +7,15 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QPixmap
 import os
 import glob
-import requests
 
-id = '10006646'
-key = 'c66af4c46b1b1895c1aee8fa94f2d8a7'
-url = f'https://cn.apihz.cn/api/tianqi/tqyb.php'
+from weather_client import fetch_observation
+from weather_record import RegionCatalog, format_number
 
 import json
 
 with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
     data = json.load(f)
+catalog = RegionCatalog(data)
 
 class weather_APP(QWidget):
     def __init__(self, parent=None):
@@ -93,24 +92,26 @@ class weather_APP(QWidget):
         city = self.city.currentText()
         area = self.area.currentText()
         if self.area.currentText() != '--区域--':
-            url_total = url + f'?id={id}&key={key}&sheng={sheng}&place={area}'
+            place, region_code = area, catalog.lookup(sheng, city, area)
         elif self.city.currentText() != '--市区-':
-            url_total = url + f'?id={id}&key={key}&sheng={sheng}&place={city}'
+            place, region_code = city, catalog.lookup(sheng, city)
         else:
             self.button_signal = None
+            self.show_dialog()
+            return
 
         try:
-            response = requests.get(url_total)
-            data = response.json()
-            self.city_label.setText(f"城市: {data['place']}")
-            self.temp_label.setText(f"温度: {data['temperature']}℃")
-            self.weather_label.setText(f"天气: {data['weather1']}转{data['weather2']}")
-            self.humidity_label.setText(f"湿度: {data['humidity']}%")
-            self.wind_label.setText(f"风速: {data['windScale']}（{data['windSpeed']}m/s")
+            # 服务商地址和凭据见 ../files/providers.json
+            data = fetch_observation(sheng, place, region_code)
+            self.city_label.setText(f"城市: {data.place}")
+            self.temp_label.setText(f"温度: {format_number(data.temperature)}℃")
+            self.weather_label.setText(f"天气: {data.weather1_name}转{data.weather2_name}")
+            self.humidity_label.setText(f"湿度: {format_number(data.humidity)}%")
+            self.wind_label.setText(f"风速: {data.wind_scale or '--'}（{format_number(data.wind_speed)}m/s")
             for png_file in self.png_files:
-                if data['weather1'] == os.path.splitext(os.path.basename(png_file))[0]:
+                if data.weather1_name == os.path.splitext(os.path.basename(png_file))[0]:
                     self.weather_icon_1.setPixmap(QPixmap(png_file))
-                if data['weather2'] == os.path.splitext(os.path.basename(png_file))[0]:
+                if data.weather2_name == os.path.splitext(os.path.basename(png_file))[0]:
                     self.weather_icon_2.setPixmap(QPixmap(png_file))
         except Exception:
             self.show_dialog()
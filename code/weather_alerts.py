@@ -0,0 +1,263 @@
+"""
+天气告警规则引擎
+
+规则按作用区域和字段编译成索引: 每条新观测只查找其所在区域及各级上级
+区域挂载的规则，数值阈值用二分查找、天气现象用编码直接查表，
+不需要扫描全部规则或全部区域。告警只在状态变化时产生（触发/解除）。
+
+规则文件每行一条，# 开头为注释:
+名称: 字段 运算符 值 [@ 省份[/城市[/区县]]]
+
+高温: temperature > 38 @ 广东省
+暴雨: weather1 in 暴雨,大暴雨,特大暴雨
+"""
+import logging
+import re
+from bisect import bisect_left, bisect_right
+
+from weather_record import ancestor_codes, condition_code, format_number
+
+# 数值字段和天气现象字段
+NUMERIC_FIELDS = ('temperature', 'humidity', 'wind_speed')
+CONDITION_FIELDS = ('weather1', 'weather2')
+NUMERIC_OPERATORS = ('>', '>=', '<', '<=')
+
+# 全国范围规则挂载的区域编码
+NATIONWIDE = 0
+
+_RULE_PATTERN = re.compile(
+    r'^(?P<name>[^:：]+)[:：]\s*(?P<field>\w+)\s*(?P<op>>=|<=|>|<|==|in)\s*(?P<value>[^@]+?)\s*(?:@\s*(?P<scope>.+))?$'
+)
+
+
+class AlertRule:
+    """
+    单条告警规则
+
+    参数:
+    name -- 规则名称
+    field -- 观测字段名
+    op -- 运算符
+    value -- 数值阈值，或天气现象名称的集合
+    scope -- 作用区域编码，0表示全国
+    scope_text -- 作用区域的原始描述
+    """
+    __slots__ = ('id', 'name', 'field', 'op', 'value', 'scope', 'scope_text')
+
+    def __init__(self, name, field, op, value, scope=NATIONWIDE, scope_text='全国'):
+        self.id = None
+        self.name = name
+        self.field = field
+        self.op = op
+        self.value = value
+        self.scope = scope
+        self.scope_text = scope_text
+
+    def describe(self):
+        """规则的可读描述"""
+        if self.field in CONDITION_FIELDS:
+            condition = f"{self.field} in {','.join(sorted(self.value))}"
+        else:
+            condition = f"{self.field} {self.op} {format_number(self.value)}"
+        return f"{self.name}: {condition} @ {self.scope_text}"
+
+
+def parse_rule(text, catalog):
+    """
+    解析一行规则文本
+
+    参数:
+    text -- 规则文本
+    catalog -- RegionCatalog，用于解析作用区域
+
+    格式错误或区域不存在时抛出 ValueError
+    """
+    match = _RULE_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"无法解析的规则: {text}")
+    name, field, op, value = (match.group(g).strip() for g in ('name', 'field', 'op', 'value'))
+
+    scope, scope_text = NATIONWIDE, '全国'
+    if match.group('scope'):
+        scope_text = match.group('scope').strip()
+        parts = [part.strip() for part in scope_text.split('/')]
+        scope = catalog.lookup(*parts) if len(parts) <= 3 else None
+        if scope is None:
+            raise ValueError(f"未知的区域: {scope_text}")
+
+    if field in NUMERIC_FIELDS:
+        if op not in NUMERIC_OPERATORS:
+            raise ValueError(f"数值字段 {field} 不支持运算符 {op}")
+        try:
+            threshold = float(value)
+        except ValueError:
+            raise ValueError(f"无效的阈值: {value}")
+        return AlertRule(name, field, op, threshold, scope, scope_text)
+
+    if field in CONDITION_FIELDS:
+        if op not in ('in', '=='):
+            raise ValueError(f"天气字段 {field} 只支持 in 或 ==")
+        names = frozenset(item.strip() for item in re.split(r'[,，]', value.strip('{}')) if item.strip())
+        return AlertRule(name, field, 'in', names, scope, scope_text)
+
+    raise ValueError(f"未知的字段: {field}")
+
+
+def load_rules(path, catalog):
+    """
+    从规则文件加载规则
+
+    参数:
+    path -- 规则文件路径
+    catalog -- RegionCatalog
+    """
+    rules = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                rules.append(parse_rule(line, catalog))
+            except ValueError as e:
+                raise ValueError(f"{path} 第{number}行: {e}")
+    return rules
+
+
+class _ThresholdIndex:
+    """某区域某数值字段上同一运算符的规则，按阈值排序"""
+    __slots__ = ('thresholds', 'rule_ids')
+
+    def __init__(self, entries):
+        entries.sort()
+        self.thresholds = [threshold for threshold, _ in entries]
+        self.rule_ids = [rule_id for _, rule_id in entries]
+
+
+class _ScopeIndex:
+    """挂载在某个区域上的全部规则"""
+    __slots__ = ('numeric', 'conditions')
+
+    def __init__(self):
+        self.numeric = {}  # (字段, 运算符) -> _ThresholdIndex
+        self.conditions = {}  # (字段, 天气现象编码) -> [规则ID]
+
+    def matches(self, observation, matched):
+        """将该区域上命中的规则ID加入matched"""
+        for (field, op), index in self.numeric.items():
+            value = getattr(observation, field)
+            if value != value:  # NaN，缺失值不触发任何规则
+                continue
+            if op == '>':
+                matched.update(index.rule_ids[:bisect_left(index.thresholds, value)])
+            elif op == '>=':
+                matched.update(index.rule_ids[:bisect_right(index.thresholds, value)])
+            elif op == '<':
+                matched.update(index.rule_ids[bisect_right(index.thresholds, value):])
+            else:
+                matched.update(index.rule_ids[bisect_left(index.thresholds, value):])
+        for field in CONDITION_FIELDS:
+            rule_ids = self.conditions.get((field, getattr(observation, field)))
+            if rule_ids:
+                matched.update(rule_ids)
+
+
+class Alert:
+    """
+    告警事件
+
+    参数:
+    rule -- 触发的AlertRule
+    observation -- 引起状态变化的WeatherObservation
+    raised -- True 表示触发，False 表示解除
+    """
+    __slots__ = ('rule', 'observation', 'raised')
+
+    def __init__(self, rule, observation, raised):
+        self.rule = rule
+        self.observation = observation
+        self.raised = raised
+
+    def message(self, catalog):
+        """生成告警消息"""
+        state = '触发' if self.raised else '解除'
+        observation = self.observation
+        return (f"[{state}] {self.rule.name} - {catalog.describe(observation.region_code)}: "
+                f"{format_number(observation.temperature)}℃ {observation.weather1_name}转{observation.weather2_name}")
+
+
+class AlertEngine:
+    """
+    增量告警引擎
+
+    参数:
+    rules -- AlertRule 列表
+    """
+
+    def __init__(self, rules=()):
+        self.rules = []
+        self.scopes = {}  # 区域编码 -> _ScopeIndex
+        self.active = {}  # 观测区域编码 -> 正在触发的规则ID集合
+        self.compile(rules)
+
+    def compile(self, rules):
+        """编译规则索引，已触发的状态会被清空"""
+        self.rules = list(rules)
+        self.scopes = {}
+        self.active = {}
+        pending = {}  # (区域, 字段, 运算符) -> [(阈值, 规则ID)]
+        for rule_id, rule in enumerate(self.rules):
+            rule.id = rule_id
+            scope = self.scopes.setdefault(rule.scope, _ScopeIndex())
+            if rule.field in NUMERIC_FIELDS:
+                pending.setdefault((rule.scope, rule.field, rule.op), []).append((rule.value, rule_id))
+            else:
+                for name in rule.value:
+                    scope.conditions.setdefault((rule.field, condition_code(name)), []).append(rule_id)
+        for (scope, field, op), entries in pending.items():
+            self.scopes[scope].numeric[(field, op)] = _ThresholdIndex(entries)
+
+    def process(self, observation):
+        """
+        处理一条新观测，返回状态发生变化的 Alert 列表
+
+        只计算观测所在区域及其上级区域（含全国）挂载的规则
+        """
+        matched = set()
+        for code in ancestor_codes(observation.region_code) + [NATIONWIDE]:
+            scope = self.scopes.get(code)
+            if scope is not None:
+                scope.matches(observation, matched)
+
+        previous = self.active.get(observation.region_code, frozenset())
+        if matched == previous:
+            return []
+        if matched:
+            self.active[observation.region_code] = matched
+        else:
+            self.active.pop(observation.region_code, None)
+
+        alerts = [Alert(self.rules[rule_id], observation, True) for rule_id in sorted(matched - previous)]
+        alerts.extend(Alert(self.rules[rule_id], observation, False) for rule_id in sorted(previous - matched))
+        return alerts
+
+    def active_count(self):
+        """正在触发的 (区域, 规则) 数量"""
+        return sum(len(rule_ids) for rule_ids in self.active.values())
+
+
+def open_alert_log(path):
+    """
+    创建写入本地告警日志文件的logger
+
+    参数:
+    path -- 日志文件路径
+    """
+    logger = logging.getLogger('weather_alerts')
+    if not logger.handlers:
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s', '%Y-%m-%d %H:%M:%S'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,293 @@
+"""
+预热天气快照包
+
+由一个实例（或定时任务）抓取全目录生成带签名、带版本号的快照包，
+其他实例启动时加载到缓存中，只需抓取包中缺失或过期的区域。
+
+文件布局（小端序）:
+头部 | 索引（按区域编码排序的int32数组）| 定长记录 | 字符串表(JSON) | HMAC-SHA256签名(32字节)
+加载时先内存映射并校验签名，再通过索引二分查找或顺序读取记录，不做整体解析。
+
+用法:
+python weather_bundle.py build --out snapshot.wxb --key-file bundle.key
+python weather_bundle.py info snapshot.wxb --key-file bundle.key
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+from weather_record import RegionCatalog, WeatherObservation, condition_code
+
+MAGIC = b'WXBNDL1\0'
+FORMAT_VERSION = 1
+
+# 头部: 魔数, 格式版本, 快照版本, 生成时间, 记录数, 字符串表偏移, 字符串表长度
+HEADER = struct.Struct('<8sIQdIQQ')
+# 记录: 观测区域编码, 温度, 湿度, 风速, 获取时间, 地点, 风力, 当前天气, 未来天气（后四项为字符串表索引）
+RECORD = struct.Struct('<iddddIIII')
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+# 签名密钥来源
+KEY_ENV = 'WEATHER_BUNDLE_KEY'
+
+
+class BundleError(Exception):
+    """快照包格式错误或签名校验失败"""
+
+
+def load_key(key_file=None):
+    """
+    读取签名密钥，优先使用密钥文件，其次使用环境变量 WEATHER_BUNDLE_KEY
+
+    未配置密钥时返回None
+    """
+    if key_file:
+        with open(key_file, 'rb') as f:
+            return f.read().strip()
+    value = os.environ.get(KEY_ENV)
+    return value.encode('utf-8') if value else None
+
+
+def write_bundle(path, entries, key, version=None):
+    """
+    写出快照包
+
+    参数:
+    path -- 输出文件路径
+    entries -- {缓存区域编码: WeatherObservation}
+    key -- 签名密钥（bytes）
+    version -- 快照版本号，默认为生成时间的整数秒
+    """
+    created = time.time()
+    version = int(created) if version is None else version
+    codes = sorted(entries)
+
+    strings = []
+    string_index = {}
+
+    def encode(value):
+        index = string_index.get(value)
+        if index is None:
+            index = string_index[value] = len(strings)
+            strings.append(value)
+        return index
+
+    index = array('i', codes)
+    records = bytearray(RECORD.size * len(codes))
+    for i, code in enumerate(codes):
+        observation = entries[code]
+        RECORD.pack_into(records, i * RECORD.size, observation.region_code,
+                         observation.temperature, observation.humidity, observation.wind_speed,
+                         observation.timestamp, encode(observation.place), encode(observation.wind_scale),
+                         encode(observation.weather1_name), encode(observation.weather2_name))
+    if sys.byteorder != 'little':
+        index.byteswap()
+    string_table = json.dumps(strings, ensure_ascii=False).encode('utf-8')
+
+    strings_offset = HEADER.size + len(codes) * (index.itemsize + RECORD.size)
+    body = b''.join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, version, created, len(codes), strings_offset, len(string_table)),
+        index.tobytes(),
+        bytes(records),
+        string_table,
+    ])
+    signature = hmac.new(key, body, hashlib.sha256).digest()
+
+    # 先写临时文件再替换，避免其他实例读到写了一半的包
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(body)
+        f.write(signature)
+    os.replace(temp_path, path)
+    return version
+
+
+class SnapshotBundle:
+    """
+    以内存映射方式读取快照包
+
+    参数:
+    path -- 快照包路径
+    key -- 签名密钥（bytes），校验失败时抛出 BundleError
+    """
+
+    def __init__(self, path, key):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise BundleError(f"{path} 是空文件")
+        try:
+            self._open(path, key)
+        except BundleError:
+            self.close()
+            raise
+
+    def _open(self, path, key):
+        if len(self.map) < HEADER.size + SIGNATURE_SIZE:
+            raise BundleError(f"{path} 不是有效的快照包")
+        magic, format_version, self.version, self.created, self.count, strings_offset, strings_length = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise BundleError(f"{path} 不是有效的快照包")
+        if format_version != FORMAT_VERSION:
+            raise BundleError(f"不支持的快照包版本: {format_version}")
+
+        body_length = len(self.map) - SIGNATURE_SIZE
+        if strings_offset + strings_length != body_length:
+            raise BundleError(f"{path} 长度不一致，可能已损坏")
+        expected = hmac.new(key, memoryview(self.map)[:body_length], hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, self.map[body_length:]):
+            raise BundleError(f"{path} 签名校验失败")
+
+        index_end = HEADER.size + self.count * 4
+        self.index = memoryview(self.map)[HEADER.size:index_end].cast('i')
+        if sys.byteorder != 'little':
+            self.index = array('i', self.index)
+            self.index.byteswap()
+        self.records_offset = index_end
+        self.strings = json.loads(self.map[strings_offset:strings_offset + strings_length].decode('utf-8'))
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, code):
+        i = bisect_left(self.index, code)
+        return i < self.count and self.index[i] == code
+
+    def _record(self, i):
+        region_code, temperature, humidity, wind_speed, timestamp, place, wind_scale, weather1, weather2 = \
+            RECORD.unpack_from(self.map, self.records_offset + i * RECORD.size)
+        return WeatherObservation(
+            region_code, sys.intern(self.strings[place]), temperature, humidity,
+            sys.intern(self.strings[wind_scale]), wind_speed,
+            condition_code(self.strings[weather1]), condition_code(self.strings[weather2]), timestamp,
+        )
+
+    def get(self, code):
+        """按缓存区域编码查找观测记录，不存在时返回None"""
+        i = bisect_left(self.index, code)
+        if i < self.count and self.index[i] == code:
+            return self._record(i)
+        return None
+
+    def items(self):
+        """按区域编码顺序产出 (缓存区域编码, WeatherObservation)"""
+        for i in range(self.count):
+            yield self.index[i], self._record(i)
+
+    def load_into(self, cache):
+        """
+        将包中的记录合并到缓存，已有更新数据的区域保持不变，返回载入条数
+
+        参数:
+        cache -- {区域编码: WeatherObservation}
+        """
+        loaded = 0
+        for code, observation in self.items():
+            current = cache.get(code)
+            if current is None or current.timestamp < observation.timestamp:
+                cache[code] = observation
+                loaded += 1
+        return loaded
+
+    def close(self):
+        if hasattr(self, 'index') and isinstance(self.index, memoryview):
+            self.index.release()
+        if hasattr(self, 'map') and not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def missing_regions(catalog, cache, max_age=600):
+    """
+    列出缓存中缺失或已过期的区域编码
+
+    参数:
+    catalog -- RegionCatalog
+    cache -- {区域编码: WeatherObservation}
+    max_age -- 视为有效的最大时长（秒）
+    """
+    now = time.time()
+    return [code for code in catalog if code not in cache or cache[code].age(now) >= max_age]
+
+
+def build_bundle(catalog, path, key, base=None, max_workers=8):
+    """
+    抓取全目录天气并生成快照包，返回 (快照版本, 记录数, 失败数)
+
+    参数:
+    catalog -- RegionCatalog
+    path -- 输出文件路径
+    key -- 签名密钥
+    base -- 可选的上一版快照包路径，仍然有效的区域不再重复抓取
+    max_workers -- 并发抓取线程数
+    """
+    from weather_client import sweep_catalog
+
+    entries = {}
+    if base and os.path.exists(base):
+        with SnapshotBundle(base, key) as previous:
+            previous.load_into(entries)
+
+    failed = 0
+    for code, observation, error in sweep_catalog(catalog, missing_regions(catalog, entries), max_workers):
+        if observation is None:
+            failed += 1
+            print(f"{catalog.describe(code)}: {error}", file=sys.stderr)
+            continue
+        entries[code] = observation
+    version = write_bundle(path, entries, key)
+    return version, len(entries), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成或查看预热天气快照包')
+    parser.add_argument('--key-file', help=f'签名密钥文件，默认读取环境变量 {KEY_ENV}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='抓取全目录并生成快照包')
+    build.add_argument('--out', required=True, help='输出文件路径')
+    build.add_argument('--base', help='上一版快照包，仍然有效的区域不再抓取')
+    build.add_argument('--workers', type=int, default=8, help='并发抓取线程数')
+
+    info = subparsers.add_parser('info', help='校验并显示快照包信息')
+    info.add_argument('path', help='快照包路径')
+
+    args = parser.parse_args(argv)
+    key = load_key(args.key_file)
+    if not key:
+        parser.error(f"未配置签名密钥，请使用 --key-file 或设置环境变量 {KEY_ENV}")
+
+    if args.command == 'build':
+        with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+            catalog = RegionCatalog(json.load(f))
+        version, count, failed = build_bundle(catalog, args.out, key, args.base, args.workers)
+        print(f"快照版本 {version}: {count} 条，失败 {failed} 条 -> {args.out}")
+    else:
+        try:
+            with SnapshotBundle(args.path, key) as bundle:
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(bundle.created))
+                print(f"快照版本 {bundle.version}，生成于 {created}，共 {len(bundle)} 条，签名有效")
+        except BundleError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
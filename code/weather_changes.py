@@ -0,0 +1,307 @@
+"""
+天气变化订阅
+
+将每条新观测与该区域上一次的值比较，忽略只有获取时间不同的无效刷新，
+真正有变化时通过进程内订阅和追加写入的本地文件发布变化记录。
+
+变化文件为JSON-lines，每行一条，字段:
+seq -- 递增序号
+region_code -- 区域编码
+changed -- 发生变化的字段名列表
+observation -- 新观测（与 WeatherObservation.to_dict() 相同的字段）
+
+变化文件分段，只追加不重写: 第0段为 path 本身，第n段为 path.n。当前段超过
+COMPACT_BYTES 后新建下一段，以一行 {"segment": n, "after_seq": 上一段最后的序号}
+开头，随后是各区域最后一条记录的快照（保留原序号），之后的变化追加到新段，
+只保留当前段和上一段，使启动时的恢复耗时有上限。
+
+消费方记录 read_changes() 返回的偏移（段号 * SEGMENT_SPAN + 段内字节偏移），
+之后用 read_changes(path, offset) 或 follow(path, offset) 从该偏移继续读取。
+从上一段读到新段时会跳过快照部分；偏移所在的段已被清理时从最早的段开头
+（含快照）读取。异常退出时写了一半的行会被跳过，下次启动时截掉。
+"""
+import json
+import math
+import os
+import threading
+import time
+
+from weather_record import WeatherObservation
+
+# 参与比较的字段: (WeatherObservation属性, to_dict字段名)
+MEANINGFUL_FIELDS = (
+    ('place', 'place'),
+    ('temperature', 'temperature'),
+    ('humidity', 'humidity'),
+    ('wind_scale', 'windScale'),
+    ('wind_speed', 'windSpeed'),
+    ('weather1', 'weather1'),
+    ('weather2', 'weather2'),
+)
+
+# 当前段超过该大小（字节）时新建以快照开头的下一段
+COMPACT_BYTES = 8 * 1024 * 1024
+
+# 偏移中段号的单位，段内字节偏移小于该值
+SEGMENT_SPAN = 1 << 40
+
+
+class WeatherChange:
+    """
+    一次有效变化
+
+    参数:
+    seq -- 递增序号
+    observation -- 新观测
+    previous -- 上一次的观测，首次出现时为None
+    changed -- 发生变化的字段名列表（to_dict字段名）
+    """
+    __slots__ = ('seq', 'observation', 'previous', 'changed')
+
+    def __init__(self, seq, observation, previous, changed):
+        self.seq = seq
+        self.observation = observation
+        self.previous = previous
+        self.changed = changed
+
+    @property
+    def region_code(self):
+        return self.observation.region_code
+
+    def to_record(self):
+        """转换为写入变化文件的字典"""
+        observation = {name: (None if isinstance(value, float) and math.isnan(value) else value)
+                       for name, value in self.observation.to_dict().items()}
+        return {'seq': self.seq, 'region_code': self.region_code, 'changed': self.changed,
+                'observation': observation}
+
+
+def _differs(old, new, tolerance):
+    if isinstance(old, float):
+        if math.isnan(old) or math.isnan(new):
+            return math.isnan(old) != math.isnan(new)
+        return abs(old - new) > tolerance
+    return old != new
+
+
+def observation_from_record(record):
+    """从变化记录还原 WeatherObservation"""
+    data = record['observation']
+    return WeatherObservation.from_response(data, data['region_code'], data['timestamp'])
+
+
+class ChangeFeed:
+    """
+    增量变化发布器
+
+    参数:
+    path -- 追加写入的变化文件路径，为None时只做进程内发布
+    tolerances -- {to_dict字段名: 容差}，数值变化不超过容差视为未变化
+    restore -- 启动时是否从已有变化文件恢复各区域的最后值
+    compact_bytes -- 当前段超过该大小时新建以快照开头的下一段，不恢复时不分段
+    """
+
+    def __init__(self, path=None, tolerances=None, restore=True, compact_bytes=COMPACT_BYTES):
+        self.path = path
+        self.tolerances = tolerances or {}
+        self.last = {}  # 区域编码 -> 最后一次的 WeatherObservation
+        self.records = {}  # 区域编码 -> 最后一条变化记录，用于生成快照
+        self.subscribers = []
+        self.seq = 0
+        self.segment = 0  # 当前追加写入的段号
+        self.lock = threading.Lock()
+        self.file = None
+        # 不恢复时不知道已有的记录，新段的快照会缺少它们
+        self.compact_bytes = compact_bytes if restore else None
+        self.compact_at = compact_bytes
+        if path:
+            segments = list_segments(path)
+            if segments:
+                self.segment = segments[-1]
+                if restore:
+                    self._restore()
+            self.file = open(segment_path(path, self.segment), 'a', encoding='utf-8')
+            self._compact_if_needed()
+
+    def _restore(self):
+        # 当前段以快照开头，只需读取当前段即可恢复各区域的最后值，跳过残缺的行
+        current = segment_path(self.path, self.segment)
+        end = 0
+        for offset, record in read_changes(self.path, self.segment * SEGMENT_SPAN):
+            self.last[record['region_code']] = observation_from_record(record)
+            self.records[record['region_code']] = record
+            self.seq = max(self.seq, record['seq'])
+            end = offset % SEGMENT_SPAN
+        end = max(end, _header_length(current))
+        if os.path.getsize(current) > end:
+            # 上次写入中途退出，截掉末尾不完整的行，之后的记录从新的一行开始
+            with open(current, 'r+b') as f:
+                f.truncate(end)
+
+    def _compact_if_needed(self):
+        if self.compact_bytes is None or self.file.tell() <= self.compact_at:
+            return
+        # 先写临时文件再改名，中途退出时不会留下不完整的新段；已有的段不做修改
+        segment = self.segment + 1
+        new_path = segment_path(self.path, segment)
+        with open(new_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'segment': segment, 'after_seq': self.seq}) + '\n')
+            for record in sorted(self.records.values(), key=lambda record: record['seq']):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            size = f.tell()
+        os.replace(new_path + '.tmp', new_path)
+        self.file.close()
+        self.file = open(new_path, 'a', encoding='utf-8')
+        self.segment = segment
+        # 保留上一段供尚未读完的消费方继续读取，更早的段删除
+        for old in list_segments(self.path):
+            if old < segment - 1:
+                try:
+                    os.remove(segment_path(self.path, old))
+                except OSError:
+                    pass
+        # 快照本身较大时放宽阈值，避免每次发布都新建段
+        self.compact_at = max(self.compact_bytes, 2 * size)
+
+    def subscribe(self, callback):
+        """
+        订阅变化，callback 以 WeatherChange 为参数调用，返回取消订阅的函数
+
+        参数:
+        callback -- 回调函数
+        """
+        self.subscribers.append(callback)
+        return lambda: self.subscribers.remove(callback) if callback in self.subscribers else None
+
+    def diff(self, observation):
+        """返回与上一次观测相比发生变化的字段名列表，首次出现时返回全部字段"""
+        previous = self.last.get(observation.region_code)
+        if previous is None:
+            return [name for _, name in MEANINGFUL_FIELDS]
+        return [name for attr, name in MEANINGFUL_FIELDS
+                if _differs(getattr(previous, attr), getattr(observation, attr), self.tolerances.get(name, 0.0))]
+
+    def publish(self, observation):
+        """
+        提交一条新观测，有效变化时写入文件并通知订阅者，返回 WeatherChange；
+        无变化时返回None
+
+        参数:
+        observation -- WeatherObservation
+        """
+        with self.lock:
+            changed = self.diff(observation)
+            if not changed:
+                return None
+            self.seq += 1
+            change = WeatherChange(self.seq, observation, self.last.get(observation.region_code), changed)
+            self.last[observation.region_code] = observation
+            if self.file:
+                record = change.to_record()
+                self.records[observation.region_code] = record
+                self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self.file.flush()
+                self._compact_if_needed()
+
+        for callback in list(self.subscribers):
+            callback(change)
+        return change
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def segment_path(path, segment):
+    """第 segment 段变化文件的路径，第0段为 path 本身"""
+    return path if segment == 0 else f"{path}.{segment}"
+
+
+def list_segments(path):
+    """按段号从小到大列出已存在的段号"""
+    directory, name = os.path.split(os.path.abspath(path))
+    segments = [0] if os.path.exists(path) else []
+    if os.path.isdir(directory):
+        prefix = name + '.'
+        for entry in os.listdir(directory):
+            suffix = entry[len(prefix):]
+            if entry.startswith(prefix) and suffix.isdigit():
+                segments.append(int(suffix))
+    return sorted(segments)
+
+
+def _header_length(path):
+    # 段开头的段头行长度，没有段头时为0
+    with open(path, 'rb') as f:
+        line = f.readline()
+    if line.startswith(b'{"segment"') and line.endswith(b'\n'):
+        return len(line)
+    return 0
+
+
+def read_changes(path, offset=0):
+    """
+    从指定偏移读取变化文件中的完整记录，依次跨越后续的段
+
+    参数:
+    path -- 变化文件路径（第0段）
+    offset -- 起始偏移，为之前产出的偏移或0
+
+    产出 (下一条记录的偏移, 记录字典)；末尾未写完的行和异常退出留下的残缺行不会产出
+    """
+    segment, position = divmod(offset, SEGMENT_SPAN)
+    segments = [number for number in list_segments(path) if number >= segment]
+    if segments and segments[0] != segment:
+        # 偏移所在的段已被清理，从最早的段开头读取（含快照）
+        position = 0
+    continuing = False  # 是否从上一段读到本段，此时跳过本段的快照
+    for segment in segments:
+        skip_seq = None
+        try:
+            f = open(segment_path(path, segment), 'rb')
+        except FileNotFoundError:
+            # 读取期间被清理
+            position = 0
+            continue
+        with f:
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if 'seq' not in record:
+                    # 段头: 快照中的记录序号都不大于 after_seq
+                    if continuing:
+                        skip_seq = record.get('after_seq')
+                    continue
+                if skip_seq is not None and record['seq'] <= skip_seq:
+                    continue
+                yield segment * SEGMENT_SPAN + position, record
+        position = 0
+        continuing = True
+
+
+def follow(path, offset=0, poll_interval=1.0, stop=None):
+    """
+    持续跟踪变化文件，类似 tail -f
+
+    参数:
+    path -- 变化文件路径（第0段）
+    offset -- 起始偏移，为之前产出的偏移或0
+    poll_interval -- 没有新记录时的轮询间隔（秒）
+    stop -- 可选的无参函数，返回True时结束
+
+    产出 (下一条记录的偏移, 记录字典)
+    """
+    while not (stop and stop()):
+        advanced = False
+        for offset, record in read_changes(path, offset):
+            advanced = True
+            yield offset, record
+        if not advanced:
+            time.sleep(poll_interval)
@@ -0,0 +1,654 @@
+"""
+天气API客户端
+
+封装单次查询、县级→市级→省级的降级查询以及全目录批量抓取，
+不依赖Qt，可供GUI工作线程和命令行工具共用。
+
+可配置多个天气服务商（见 weather_providers.py），每个服务商有独立的
+耗时统计、熔断器和调用配额。请求优先发给中位耗时最低的可用服务商，
+失败时依次改用其他服务商。
+
+客户端根据最近请求耗时的分位数自适应设置每次请求的超时，
+并通过熔断器在服务商连续失败时直接短路，避免每次都耗尽超时。
+通过 CancelToken 可以中止正在进行的HTTP请求。
+"""
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from weather_providers import load_providers
+from weather_record import WeatherObservation
+
+# 默认单次请求超时（秒），样本不足时使用
+DEFAULT_TIMEOUT = 10
+# 通过本地代理查询的超时（秒），须大于代理的单次请求期限 weather_daemon.REQUEST_DEADLINE
+DAEMON_TIMEOUT = 12
+# 读取本地代理状态的超时（秒），代理在本机，正常情况下立即返回
+DAEMON_STATUS_TIMEOUT = 2
+# 批量抓取时每个区域等待配额恢复的最长秒数
+SWEEP_QUOTA_WAIT = 60
+
+
+class WeatherQueryError(Exception):
+    """所有降级级别均查询失败"""
+
+
+class CircuitOpenError(WeatherQueryError):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class QuotaExceededError(WeatherQueryError):
+    """未熔断的服务商均超出调用配额"""
+
+
+class QueryCanceledError(WeatherQueryError):
+    """查询被取消"""
+
+
+# 当前线程正在执行的请求所属的取消令牌
+_active = threading.local()
+
+
+class CancelToken:
+    """
+    查询取消令牌
+
+    请求执行期间，令牌会记录其使用的连接；调用 cancel() 时
+    直接关闭这些连接的套接字，使阻塞中的请求立即以连接错误返回。
+    建立连接阶段无法打断，连接建立后会立即检查取消状态。
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    @property
+    def canceled(self):
+        return self.event.is_set()
+
+    def __call__(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        """取消查询并中止正在进行的请求"""
+        self.event.set()
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            _abort_connection(connection)
+
+    def attach(self, connection):
+        """登记当前请求使用的连接，已取消时立即中止"""
+        with self.lock:
+            self.connections.add(connection)
+        if self.canceled:
+            _abort_connection(connection)
+
+    def clear(self):
+        """请求结束后清除登记的连接"""
+        with self.lock:
+            self.connections.clear()
+
+
+def _abort_connection(connection):
+    # shutdown 会唤醒阻塞在该套接字上的读写，close 单独使用时不会
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class _CancelableConnectionMixin:
+    """连接建立后检查取消状态，弥补建立连接期间无法打断的缺口"""
+
+    def connect(self):
+        super().connect()
+        token = getattr(_active, 'token', None)
+        if token is not None and token.canceled:
+            _abort_connection(self)
+
+
+class _CancelableHTTPConnection(_CancelableConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CancelableHTTPSConnection(_CancelableConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CancelablePoolMixin:
+    """在发出请求前把连接登记到当前线程的取消令牌"""
+
+    def _make_request(self, conn, *args, **kwargs):
+        token = getattr(_active, 'token', None)
+        if token is not None:
+            token.attach(conn)
+        return super()._make_request(conn, *args, **kwargs)
+
+
+class _CancelableHTTPConnectionPool(_CancelablePoolMixin, HTTPConnectionPool):
+    ConnectionCls = _CancelableHTTPConnection
+
+
+class _CancelableHTTPSConnectionPool(_CancelablePoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _CancelableHTTPSConnection
+
+
+class CancelableAdapter(HTTPAdapter):
+    """使用可取消连接池的HTTPAdapter"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CancelableHTTPConnectionPool,
+            'https': _CancelableHTTPSConnectionPool,
+        }
+
+
+def cancelable_session():
+    """创建支持 CancelToken 的requests.Session"""
+    session = requests.Session()
+    adapter = CancelableAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 每个线程复用的可取消会话
+_sessions = threading.local()
+
+
+def thread_session():
+    """获取当前线程的可取消会话"""
+    if not hasattr(_sessions, 'session'):
+        _sessions.session = cancelable_session()
+    return _sessions.session
+
+
+def _send(session, url_total, timeout, cancel_token, params=None):
+    # 在取消令牌作用域内发送请求并读取响应体
+    if cancel_token is None:
+        return session.get(url_total, params=params, timeout=timeout)
+    if cancel_token.canceled:
+        raise QueryCanceledError("查询已取消")
+    _active.token = cancel_token
+    try:
+        return session.get(url_total, params=params, timeout=timeout)
+    finally:
+        _active.token = None
+        cancel_token.clear()
+
+
+class LatencyTracker:
+    """
+    滚动窗口内的请求耗时统计
+
+    超时的请求没有耗时样本，服务商整体变慢到超过当前超时后样本不再更新，
+    因此每次超时把下一次的超时翻倍（不超过上限），直到成功的耗时追上
+
+    参数:
+    window -- 保留的最近样本数
+    min_samples -- 开始自适应前所需的最少样本数
+    percentile -- 用于计算超时的分位数（0~100）
+    multiplier -- 超时 = 分位耗时 * multiplier
+    min_timeout -- 超时下限（秒）
+    max_timeout -- 超时上限（秒）
+    """
+
+    def __init__(self, window=100, min_samples=5, percentile=95, multiplier=3.0,
+                 min_timeout=1.0, max_timeout=DEFAULT_TIMEOUT):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.percentile_value = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.backoff = 0.0  # 超时后退避得到的超时下限
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        """记录一次请求耗时，退避下限随之缩小到该耗时对应的超时"""
+        with self.lock:
+            self.samples.append(seconds)
+            if self.backoff:
+                self.backoff = min(self.backoff, seconds * self.multiplier)
+
+    def record_timeout(self, timeout):
+        """
+        记录一次超时，下一次的超时至少为本次的两倍
+
+        参数:
+        timeout -- 本次请求使用的超时（秒）
+        """
+        with self.lock:
+            self.backoff = min(self.max_timeout, max(self.backoff, timeout) * 2)
+
+    def percentile(self, p):
+        """计算第p百分位耗时，无样本时返回None"""
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def timeout(self):
+        """根据当前耗时分布计算下一次请求的超时（秒）"""
+        with self.lock:
+            enough = len(self.samples) >= self.min_samples
+        if not enough:
+            return self.max_timeout
+        value = max(self.percentile(self.percentile_value) * self.multiplier, self.backoff)
+        return max(self.min_timeout, min(self.max_timeout, value))
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    关闭: 正常放行；连续失败达到阈值后打开。
+    打开: 拒绝所有请求，冷却时间过后进入半开。
+    半开: 只放行有限个探测请求，成功则关闭，失败则重新打开。
+
+    参数:
+    failure_threshold -- 触发熔断的连续失败次数
+    reset_timeout -- 打开后等待多少秒进入半开
+    half_open_probes -- 半开状态下同时放行的探测请求数
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, half_open_probes=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        # 冷却时间已过则从打开转为半开（调用方持有锁）
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probes = 0
+
+    def current_state(self):
+        """获取当前状态"""
+        with self.lock:
+            self._refresh()
+            return self.state
+
+    def retry_in(self):
+        """打开状态下距离进入半开的剩余秒数"""
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow_request(self):
+        """判断是否放行一次请求，半开状态下会占用一个探测名额"""
+        with self.lock:
+            self._refresh()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self.probes < self.half_open_probes:
+                self.probes += 1
+                return True
+            return False
+
+    def record_success(self):
+        """记录一次成功，关闭熔断器"""
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probes = 0
+
+    def record_canceled(self):
+        """请求被主动取消，归还半开状态下占用的探测名额"""
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_failure(self):
+        """记录一次失败，必要时打开熔断器"""
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probes = 0
+
+
+class ProviderRoute:
+    """
+    单个服务商及其耗时统计和熔断器
+
+    参数:
+    provider -- weather_providers.Provider
+    latency -- LatencyTracker，默认新建
+    breaker -- CircuitBreaker，默认新建
+    """
+
+    def __init__(self, provider, latency=None, breaker=None):
+        self.provider = provider
+        self.latency = latency or LatencyTracker()
+        self.breaker = breaker or CircuitBreaker()
+
+    @property
+    def name(self):
+        return self.provider.name
+
+    def fetch(self, sheng, place, region_code, timeout=None, session=None, cancel_token=None):
+        """通过该服务商查询单个地点，参数同 WeatherClient.fetch_observation"""
+        params = self.provider.request_params(sheng, place)
+
+        if timeout is None:
+            # 半开探测使用最长超时，服务商变慢后也能探测到恢复
+            if self.breaker.current_state() == CircuitBreaker.HALF_OPEN:
+                timeout = self.latency.max_timeout
+            else:
+                timeout = self.latency.timeout()
+
+        # 发送网络请求，网络错误和HTTP错误计入熔断
+        start = time.monotonic()
+        try:
+            response = _send(session or requests, self.provider.url, timeout, cancel_token, params)
+            response.raise_for_status()  # 检查HTTP错误状态码
+        except (requests.exceptions.RequestException, QueryCanceledError) as e:
+            # 主动取消导致的连接错误不计入熔断
+            if cancel_token is not None and cancel_token.canceled:
+                self.breaker.record_canceled()
+                raise QueryCanceledError("查询已取消")
+            if isinstance(e, requests.exceptions.Timeout):
+                self.latency.record_timeout(timeout)
+            self.breaker.record_failure()
+            raise
+        self.latency.record(time.monotonic() - start)
+        self.breaker.record_success()
+
+        # 解析JSON响应并转换为通用字段，无效数据时抛出 ValueError
+        return WeatherObservation.from_response(self.provider.parse(response.json()), region_code)
+
+    def status(self):
+        """服务商状态字典"""
+        return {
+            'name': self.name,
+            'breaker': self.breaker.current_state(),
+            'latency_p50': self.latency.percentile(50),
+            'timeout': self.latency.timeout(),
+            'remaining_today': self.provider.quota.remaining_today(),
+        }
+
+
+class WeatherClient:
+    """
+    多服务商天气客户端，带自适应超时、熔断和故障转移
+
+    参数:
+    providers -- Provider 列表，默认从服务商配置文件加载
+    """
+
+    def __init__(self, providers=None):
+        if providers is None:
+            providers = load_providers()
+        self.routes = [ProviderRoute(provider) for provider in providers]
+
+    def candidates(self):
+        """
+        按中位耗时从低到高排列的可用服务商，熔断中的不参与
+
+        无耗时样本的排在最前，以便尽快获得耗时数据；半开状态的服务商
+        按熔断前的耗时参与排序，这样恢复后能被探测到并重新承担请求
+        """
+        ranked = []
+        for index, route in enumerate(self.routes):
+            if route.breaker.current_state() == CircuitBreaker.OPEN:
+                continue
+            ranked.append((route.latency.percentile(50) or 0.0, index, route))
+        ranked.sort(key=lambda item: item[:2])
+        return [route for *_, route in ranked]
+
+    def available(self):
+        """是否有未熔断的服务商"""
+        return any(route.breaker.current_state() != CircuitBreaker.OPEN for route in self.routes)
+
+    def retry_in(self):
+        """所有服务商都熔断时，距离最早一个进入半开的剩余秒数"""
+        return min((route.breaker.retry_in() for route in self.routes), default=0.0)
+
+    def fetch_observation(self, sheng, place, region_code, timeout=None, session=None, cancel_token=None,
+                          quota_wait=0.0):
+        """
+        查询单个地点的天气，按 candidates() 的顺序依次尝试各服务商
+
+        参数:
+        sheng -- 省份名称
+        place -- 地点名称
+        region_code -- 地点对应的区域编码
+        timeout -- 请求超时（秒），默认根据各服务商的耗时统计自适应
+        session -- 可选的requests.Session，用于复用连接
+        cancel_token -- 可选的CancelToken，需配合 cancelable_session() 创建的会话
+        quota_wait -- 所有服务商都超出每秒配额时最多等待的秒数，默认不等待
+
+        服务商均熔断时抛出 CircuitOpenError，未熔断的均超出配额时抛出 QuotaExceededError，
+        全部服务商失败时抛出 WeatherQueryError
+        """
+        if not self.routes:
+            raise WeatherQueryError("未配置天气服务商")
+
+        deadline = time.monotonic() + quota_wait
+        while True:
+            errors = []
+            limited = False  # 是否有服务商因配额被跳过
+            wait = None  # 最早恢复额度的服务商还需等待的秒数
+            for route in self.candidates():
+                if not route.breaker.allow_request():
+                    continue
+                # 超出配额的服务商直接跳过，不计入熔断，并归还半开探测名额
+                if not route.provider.quota.try_acquire():
+                    route.breaker.record_canceled()
+                    limited = True
+                    route_wait = route.provider.quota.wait_time()
+                    if route_wait is not None and (wait is None or route_wait < wait):
+                        wait = route_wait
+                    continue
+                try:
+                    return route.fetch(sheng, place, region_code, timeout, session, cancel_token)
+                except QueryCanceledError:
+                    raise
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    errors.append(f"{route.name}: {str(e)}")
+
+            if errors:
+                raise WeatherQueryError("; ".join(errors))
+            if not limited:
+                raise CircuitOpenError("天气服务暂不可用（熔断中），请稍后再试")
+            # 当日额度用完或等待超过期限时不再等待
+            if wait is None or time.monotonic() + wait > deadline:
+                raise QuotaExceededError("天气服务商调用超出配额，请稍后再试")
+            time.sleep(wait)
+            if cancel_token is not None and cancel_token.canceled:
+                raise QueryCanceledError("查询已取消")
+
+    def query_with_fallback(self, query_list, timeout=None, session=None, cancel_token=None, progress=None,
+                            quota_wait=0.0):
+        """
+        依次尝试查询列表中的地点，返回第一个成功的观测记录
+
+        参数:
+        query_list -- 查询参数列表，每个元素为元组(sheng, place, region_code)
+        timeout -- 每次请求的超时（秒），默认自适应
+        session -- 可选的requests.Session
+        cancel_token -- 可选的CancelToken
+        progress -- 可选的回调，每次尝试前以 (已尝试数, 总数) 调用
+        quota_wait -- 超出每秒配额时最多等待的秒数，见 fetch_observation()
+
+        全部失败时抛出 WeatherQueryError，消息为最后一个错误；熔断器打开时抛出
+        CircuitOpenError，超出配额时抛出 QuotaExceededError，被取消时抛出 QueryCanceledError
+        """
+        last_error = None  # 记录最后一个错误
+        for index, (sheng, place, region_code) in enumerate(query_list):
+            if progress:
+                progress(index, len(query_list))
+            try:
+                return self.fetch_observation(sheng, place, region_code, timeout, session, cancel_token,
+                                              quota_wait)
+            except (CircuitOpenError, QuotaExceededError, QueryCanceledError):
+                # 熔断、超出配额或取消后不再尝试后续级别
+                raise
+            except WeatherQueryError as e:
+                # 所有服务商均查询失败
+                last_error = f"查询 {place} 失败: {str(e)}"
+            except Exception as e:
+                # 处理其他未知错误
+                last_error = f"查询 {place} 失败: {str(e)}"
+        raise WeatherQueryError(last_error or "查询列表为空")
+
+    def provider_status(self):
+        """各服务商的状态列表"""
+        return [route.status() for route in self.routes]
+
+    def status_text(self):
+        """生成用于界面显示的服务状态描述"""
+        if not self.routes:
+            return "服务状态: 未配置服务商"
+        candidates = self.candidates()
+        if not candidates:
+            return f"服务状态: 熔断中 ({self.retry_in():.0f}秒后探测)"
+        route = candidates[0]
+        opened = len(self.routes) - len(candidates)
+        suffix = f", {opened}个服务商熔断" if opened else ""
+        if route.breaker.current_state() == CircuitBreaker.HALF_OPEN:
+            return f"服务状态: 探测恢复中{suffix}"
+        p50 = route.latency.percentile(50)
+        if p50 is None:
+            return f"服务状态: 正常 ({route.name}{suffix})"
+        return (f"服务状态: 正常 ({route.name} 中位耗时 {p50 * 1000:.0f}ms, "
+                f"超时 {route.latency.timeout():.1f}s{suffix})")
+
+
+# 进程内共享的默认客户端，使耗时统计和熔断状态跨查询保留
+default_client = WeatherClient()
+
+
+def fetch_observation(sheng, place, region_code, timeout=None, session=None, cancel_token=None):
+    """使用默认客户端查询单个地点的天气"""
+    return default_client.fetch_observation(sheng, place, region_code, timeout, session, cancel_token)
+
+
+def query_with_fallback(query_list, timeout=None, session=None, cancel_token=None, progress=None):
+    """使用默认客户端执行降级查询"""
+    return default_client.query_with_fallback(query_list, timeout, session, cancel_token, progress)
+
+
+def query_via_daemon(daemon_url, region_code, timeout=DAEMON_TIMEOUT, cancel_token=None):
+    """
+    通过本地缓存代理（weather_daemon.py）查询天气，降级查询由代理完成
+
+    返回 (WeatherObservation, stale)，上游不可用、代理返回过期缓存时 stale 为True
+
+    参数:
+    daemon_url -- 代理地址，如 http://127.0.0.1:8765
+    region_code -- 所选最细一级区域的编码
+    timeout -- 请求超时（秒）
+    cancel_token -- 可选的CancelToken
+    """
+    try:
+        response = _send(thread_session(), f"{daemon_url.rstrip('/')}/weather?code={region_code}",
+                         timeout, cancel_token)
+        payload = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        if cancel_token is not None and cancel_token.canceled:
+            raise QueryCanceledError("查询已取消")
+        raise WeatherQueryError(f"连接本地代理失败: {str(e)}")
+    if response.status_code != 200:
+        raise WeatherQueryError(payload.get('error', f"本地代理返回错误 {response.status_code}"))
+    observation = WeatherObservation.from_response(payload, payload['region_code'], payload['timestamp'])
+    return observation, bool(payload.get('stale'))
+
+
+def query_daemon_status(daemon_url, timeout=DAEMON_STATUS_TIMEOUT):
+    """
+    读取本地缓存代理的 /status，返回状态字典
+
+    参数:
+    daemon_url -- 代理地址
+    timeout -- 请求超时（秒）
+    """
+    try:
+        response = _send(thread_session(), f"{daemon_url.rstrip('/')}/status", timeout, None)
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise WeatherQueryError(f"连接本地代理失败: {str(e)}")
+
+
+def daemon_status_text(status):
+    """
+    生成用于界面显示的本地代理状态描述
+
+    参数:
+    status -- query_daemon_status() 返回的状态字典
+    """
+    providers = status.get('providers', [])
+    opened = sum(1 for provider in providers if provider['breaker'] == CircuitBreaker.OPEN)
+    if not providers:
+        upstream = "未配置服务商"
+    elif opened == len(providers):
+        upstream = "上游熔断中"
+    elif opened:
+        upstream = f"{opened}个服务商熔断"
+    else:
+        upstream = "上游正常"
+    lookups = status.get('hits', 0) + status.get('misses', 0)
+    hit_rate = f", 命中率 {status['hits'] / lookups:.0%}" if lookups else ""
+    return f"服务状态: 本地代理 ({upstream}, 缓存 {status.get('entries', 0)} 项{hit_rate})"
+
+
+def sweep_catalog(catalog, codes=None, max_workers=8, timeout=None, client=None, quota_wait=SWEEP_QUOTA_WAIT):
+    """
+    并发抓取目录中的区域天气，按完成顺序逐个产出结果
+
+    服务商超出每秒配额时等待额度恢复，抓取速度受配额限制而不是跳过区域
+
+    参数:
+    catalog -- RegionCatalog
+    codes -- 要抓取的区域编码，默认为目录全部区域
+    max_workers -- 并发线程数
+    timeout -- 每次请求的超时（秒），默认自适应
+    client -- WeatherClient，默认为 default_client
+    quota_wait -- 每个区域等待配额恢复的最长秒数
+
+    产出 (region_code, observation, error)，成功时error为None，失败时observation为None
+    """
+    client = client or default_client
+    codes = list(catalog) if codes is None else list(codes)
+    local = threading.local()
+
+    def fetch(code):
+        # 每个线程复用自己的连接
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return client.query_with_fallback(catalog.query_list(code), timeout, local.session, quota_wait=quota_wait)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, code): code for code in codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                yield code, future.result(), None
+            except WeatherQueryError as e:
+                yield code, None, str(e)
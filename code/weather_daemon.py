@@ -0,0 +1,275 @@
+"""
+本地天气缓存代理
+
+在本机提供与GUI相同语义的天气查询（县级→市级→省级降级），
+同一主机上的多个应用实例共享一份缓存、一个上游连接池和一个限流器。
+
+接口:
+GET /weather?code=190104                   按区域编码查询
+GET /weather?sheng=广东省&city=广州市&area=天河区   按名称查询（city/area可省略）
+GET /status                                缓存和上游服务状态
+
+用法:
+python weather_daemon.py --port 8765
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from weather_client import WeatherClient, WeatherQueryError, CircuitOpenError, QuotaExceededError
+from weather_record import RegionCatalog
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 缓存有效期（秒），与GUI一致
+CACHE_TTL = 600
+
+# 单次请求的最长处理时间（秒），须小于客户端 query_via_daemon 的超时；
+# 上游较慢时到期先返回过期数据或504，抓取在后台继续并写入缓存
+REQUEST_DEADLINE = 8
+
+
+class RateLimiter:
+    """
+    令牌桶限流器
+
+    参数:
+    rate -- 每秒补充的令牌数
+    burst -- 桶容量
+    """
+
+    def __init__(self, rate=5.0, burst=10):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout=10.0):
+        """获取一个令牌，超时未获取到返回False"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class SharedWeatherCache:
+    """
+    多客户端共享的天气缓存
+
+    同一区域的并发未命中只向上游发起一次请求，其余请求等待其结果。
+    缓存同时保存序列化好的响应体，命中时无需再次编码。
+    抓取在后台线程中进行，等待超过 deadline 时返回过期数据或504。
+
+    参数:
+    catalog -- RegionCatalog
+    client -- WeatherClient
+    limiter -- RateLimiter
+    session -- 共享的requests.Session（连接池）
+    ttl -- 缓存有效期（秒）
+    deadline -- 单次请求的最长处理时间（秒）
+    """
+
+    def __init__(self, catalog, client, limiter, session, ttl=CACHE_TTL, deadline=REQUEST_DEADLINE):
+        self.catalog = catalog
+        self.client = client
+        self.limiter = limiter
+        self.session = session
+        self.ttl = ttl
+        self.deadline = deadline
+        self.entries = {}  # 区域编码 -> (WeatherObservation, 响应体)
+        self.pending = {}  # 区域编码 -> [threading.Event, 抓取结果]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _encode(self, observation, stale=False):
+        payload = observation.to_dict()
+        payload['query_level'] = self.catalog.describe(observation.region_code)
+        payload['stale'] = stale
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def get(self, code):
+        """
+        查询区域天气，返回 (状态码, 响应体)
+
+        参数:
+        code -- 区域编码
+        """
+        entry = self.entries.get(code)
+        if entry is not None and entry[0].age() < self.ttl:
+            self.hits += 1
+            return 200, entry[1]
+
+        with self.lock:
+            flight = self.pending.get(code)
+            leader = flight is None
+            if leader:
+                flight = self.pending[code] = [threading.Event(), None]
+
+        if leader:
+            self.misses += 1
+            threading.Thread(target=self._run_flight, args=(code, flight), daemon=True).start()
+
+        # 其他线程正在抓取该区域时直接复用其结果
+        if not flight[0].wait(self.deadline):
+            return self._stale_or_error(code, "上游响应超时，请稍后再试", 504)
+        return flight[1]
+
+    def _run_flight(self, code, flight):
+        # 在后台线程中抓取，超过请求期限后仍会完成并写入缓存
+        try:
+            flight[1] = self._fetch(code)
+        except Exception as e:
+            flight[1] = 500, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8')
+        finally:
+            with self.lock:
+                del self.pending[code]
+            flight[0].set()
+
+    def _fetch(self, code):
+        if not self.limiter.acquire(self.deadline):
+            return self._stale_or_error(code, "请求过于频繁，请稍后再试", 429)
+        try:
+            observation = self.client.query_with_fallback(self.catalog.query_list(code), session=self.session)
+        except CircuitOpenError as e:
+            return self._stale_or_error(code, str(e), 503)
+        except QuotaExceededError as e:
+            return self._stale_or_error(code, str(e), 429)
+        except WeatherQueryError as e:
+            return self._stale_or_error(code, str(e))
+        body = self._encode(observation)
+        self.entries[code] = (observation, body)
+        return 200, body
+
+    def _stale_or_error(self, code, message, status=502):
+        # 上游不可用时返回过期数据
+        entry = self.entries.get(code)
+        if entry is not None:
+            return 200, self._encode(entry[0], stale=True)
+        return status, json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+    def status(self):
+        """缓存和上游服务状态"""
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'providers': self.client.provider_status(),
+        }
+
+
+class WeatherRequestHandler(BaseHTTPRequestHandler):
+    """处理本地客户端请求，使用HTTP/1.1保持连接以降低命中延迟"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        cache = self.server.cache
+
+        if parts.path == '/status':
+            self._reply(200, json.dumps(cache.status(), ensure_ascii=False).encode('utf-8'))
+        elif parts.path == '/weather':
+            code = self._region_code(params, cache.catalog)
+            if code is None:
+                self._reply(404, json.dumps({'error': '未知的区域'}, ensure_ascii=False).encode('utf-8'))
+            else:
+                self._reply(*cache.get(code))
+        else:
+            self._reply(404, b'{"error": "not found"}')
+
+    @staticmethod
+    def _region_code(params, catalog):
+        if 'code' in params:
+            try:
+                code = int(params['code'])
+            except ValueError:
+                return None
+            return code if code in catalog.names else None
+        if 'sheng' not in params:
+            return None
+        return catalog.lookup(params['sheng'], params.get('city'), params.get('area'))
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不逐条打印访问日志，避免高并发时拖慢响应
+        pass
+
+
+class WeatherDaemon(ThreadingHTTPServer):
+    """
+    本地缓存代理服务器
+
+    参数:
+    catalog -- RegionCatalog
+    host -- 监听地址
+    port -- 监听端口，0表示自动分配
+    rate -- 上游请求速率上限（次/秒）
+    pool_size -- 上游连接池大小
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, catalog, host=DEFAULT_HOST, port=DEFAULT_PORT, rate=5.0, pool_size=16):
+        super().__init__((host, port), WeatherRequestHandler)
+        client = WeatherClient()
+        session = requests.Session()
+        # 每个服务商一个连接池
+        adapter = HTTPAdapter(pool_connections=max(1, len(client.routes)), pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.cache = SharedWeatherCache(catalog, client, RateLimiter(rate, burst=pool_size), session)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地天气缓存代理')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--rate', type=float, default=5.0, help='上游请求速率上限（次/秒）')
+    parser.add_argument('--pool-size', type=int, default=16, help='上游连接池大小')
+    args = parser.parse_args(argv)
+
+    with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+        catalog = RegionCatalog(json.load(f))
+
+    server = WeatherDaemon(catalog, args.host, args.port, args.rate, args.pool_size)
+    print(f"本地天气代理已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
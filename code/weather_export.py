@@ -0,0 +1,434 @@
+"""
+天气快照批量导出
+
+支持三种格式:
+wxc   -- 带schema的列式二进制格式，按行组流式写入，可内存映射读取
+csv   -- 逗号分隔文本，便于人工查看
+jsonl -- 每行一个JSON对象
+
+wxc 文件布局（小端序）:
+MAGIC | 行组1的各列数据块 | 行组2 ... | 页脚JSON | 页脚长度(uint64) | MAGIC
+页脚记录schema、字符串字典以及每个行组每列的偏移和长度，
+字符串列以字典编码（uint32索引）存储，每个数据块按8字节对齐。
+
+用法:
+python weather_export.py snapshot --format wxc --out snapshot.wxc
+python weather_export.py range --since "2026-10-01 00:00:00" --format csv --out week.csv a.wxc b.wxc
+"""
+import argparse
+import csv
+import json
+import math
+import mmap
+import os
+import sys
+import time
+from array import array
+from datetime import datetime
+
+from weather_record import RegionCatalog, WeatherObservation, condition_code
+
+MAGIC = b'WXCOL1\n\0'
+FORMAT_VERSION = 1
+
+# 列定义: (列名, array类型码, 说明)，类型码 'S' 表示字典编码的字符串列
+SCHEMA = [
+    ('region_code', 'i', '区域编码（省*10000+市*100+区县）'),
+    ('admin_code', 'q', '原始行政代码'),
+    ('region_name', 'S', '区域名称'),
+    ('place', 'S', 'API返回的地点名称'),
+    ('temperature', 'd', '温度（℃）'),
+    ('humidity', 'd', '湿度（%）'),
+    ('wind_scale', 'S', '风力等级'),
+    ('wind_speed', 'd', '风速（m/s）'),
+    ('weather1', 'S', '当前天气'),
+    ('weather2', 'S', '未来天气'),
+    ('timestamp', 'd', '获取时间（epoch秒）'),
+]
+COLUMN_NAMES = [name for name, _, _ in SCHEMA]
+
+# 字典编码列使用的数组类型
+_STRING_TYPECODE = 'I'
+
+
+def _typecode(column_type):
+    return _STRING_TYPECODE if column_type == 'S' else column_type
+
+
+def observation_row(observation, catalog):
+    """将观测记录展开为与SCHEMA列顺序一致的行"""
+    code = observation.region_code
+    admin_code = catalog.admin_codes.get(code, '0') if catalog else '0'
+    return (
+        code,
+        int(admin_code) if admin_code.isdigit() else 0,
+        catalog.name(code) if catalog else '',
+        observation.place,
+        observation.temperature,
+        observation.humidity,
+        observation.wind_scale,
+        observation.wind_speed,
+        observation.weather1_name,
+        observation.weather2_name,
+        observation.timestamp,
+    )
+
+
+class _ExportWriter:
+    """
+    写入器基类: 先写入 path.tmp，正常关闭时替换为 path
+
+    导出中途出错时删除临时文件，不会留下看似完整、实际缺行的导出
+    """
+
+    def _open(self, path, mode, **kwargs):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.file = open(self.temp_path, mode, **kwargs)
+
+    def _finish(self):
+        # 子类写完剩余内容后调用
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def close(self):
+        """完成导出"""
+        if not self.file.closed:
+            self._finish()
+
+    def abort(self):
+        """放弃导出，删除临时文件"""
+        if not self.file.closed:
+            self.file.close()
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ColumnarWriter(_ExportWriter):
+    """
+    wxc 列式写入器，每累积 row_group_size 行写出一个行组
+
+    参数:
+    path -- 输出文件路径
+    catalog -- RegionCatalog，用于补充区域名称和行政代码
+    row_group_size -- 每个行组的行数
+    """
+
+    def __init__(self, path, catalog=None, row_group_size=1024):
+        self.catalog = catalog
+        self.row_group_size = row_group_size
+        self._open(path, 'wb')
+        self.file.write(MAGIC)
+        self.strings = []  # 字符串字典
+        self.string_index = {}
+        self.row_groups = []
+        self.rows = 0
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self.buffers = [array(_typecode(column_type)) for _, column_type, _ in SCHEMA]
+        self.buffered = 0
+
+    def _encode(self, value):
+        index = self.string_index.get(value)
+        if index is None:
+            index = self.string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def write(self, observation):
+        """追加一条观测记录"""
+        row = observation_row(observation, self.catalog)
+        for (_, column_type, _), buffer, value in zip(SCHEMA, self.buffers, row):
+            buffer.append(self._encode(value) if column_type == 'S' else value)
+        self.buffered += 1
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """将缓冲的行写出为一个行组"""
+        if not self.buffered:
+            return
+        columns = []
+        for buffer in self.buffers:
+            if sys.byteorder != 'little':
+                buffer.byteswap()
+            # 数据块按8字节对齐，便于内存映射后直接转换类型
+            padding = -self.file.tell() % 8
+            self.file.write(b'\0' * padding)
+            offset = self.file.tell()
+            buffer.tofile(self.file)
+            columns.append([offset, self.file.tell() - offset])
+        self.row_groups.append({'rows': self.buffered, 'columns': columns})
+        self.rows += self.buffered
+        self.file.flush()
+        self._reset_buffers()
+
+    def _finish(self):
+        # 写出剩余行组和页脚
+        self.flush()
+        footer = json.dumps({
+            'version': FORMAT_VERSION,
+            'created': time.time(),
+            'rows': self.rows,
+            'schema': [{'name': name, 'type': column_type, 'doc': doc} for name, column_type, doc in SCHEMA],
+            'strings': self.strings,
+            'row_groups': self.row_groups,
+        }, ensure_ascii=False).encode('utf-8')
+        self.file.write(footer)
+        self.file.write(len(footer).to_bytes(8, 'little'))
+        self.file.write(MAGIC)
+        super()._finish()
+
+
+class CsvWriter(_ExportWriter):
+    """CSV 写入器，逐行写出"""
+
+    def __init__(self, path, catalog=None):
+        self.catalog = catalog
+        self._open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMN_NAMES)
+
+    def write(self, observation):
+        """追加一条观测记录，缺失的数值写为空单元格"""
+        self.writer.writerow(['' if isinstance(value, float) and math.isnan(value) else value
+                              for value in observation_row(observation, self.catalog)])
+
+
+class JsonLinesWriter(_ExportWriter):
+    """JSON-lines 写入器，每行一个对象"""
+
+    def __init__(self, path, catalog=None):
+        self.catalog = catalog
+        self._open(path, 'w', encoding='utf-8')
+
+    def write(self, observation):
+        """追加一条观测记录"""
+        # NaN 不是合法的JSON，缺失的数值写为 null
+        row = {name: (None if isinstance(value, float) and math.isnan(value) else value)
+               for name, value in zip(COLUMN_NAMES, observation_row(observation, self.catalog))}
+        self.file.write(json.dumps(row, ensure_ascii=False, allow_nan=False) + '\n')
+
+
+WRITERS = {
+    'wxc': ColumnarWriter,
+    'csv': CsvWriter,
+    'jsonl': JsonLinesWriter,
+}
+
+
+def open_writer(path, fmt, catalog=None):
+    """
+    按格式创建写入器
+
+    参数:
+    path -- 输出文件路径
+    fmt -- 'wxc' / 'csv' / 'jsonl'
+    catalog -- RegionCatalog（可选）
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    return WRITERS[fmt](path, catalog)
+
+
+class ColumnarReader:
+    """
+    以内存映射方式读取 wxc 文件
+
+    参数:
+    path -- wxc 文件路径
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        tail = len(MAGIC) + 8
+        if self.map[:len(MAGIC)] != MAGIC or self.map[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} 不是有效的wxc文件")
+        footer_length = int.from_bytes(self.map[-tail:-len(MAGIC)], 'little')
+        footer = json.loads(self.map[-tail - footer_length:-tail].decode('utf-8'))
+        if footer['version'] != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"不支持的wxc版本: {footer['version']}")
+        self.schema = footer['schema']
+        self.strings = footer['strings']
+        self.row_groups = footer['row_groups']
+        self.rows = footer['rows']
+        self.created = footer['created']
+        self._column_index = {column['name']: i for i, column in enumerate(self.schema)}
+        self._views = []  # 已产出的memoryview，关闭前需全部释放
+
+    def __len__(self):
+        return self.rows
+
+    def column_chunks(self, name):
+        """
+        逐行组产出某列的数据
+
+        数值列为直接映射文件内容的memoryview（不复制），
+        字符串列为解码后的字符串列表
+        """
+        index = self._column_index[name]
+        column_type = self.schema[index]['type']
+        for group in self.row_groups:
+            offset, length = group['columns'][index]
+            base = memoryview(self.map)
+            chunk = base[offset:offset + length]
+            view = chunk.cast(_typecode(column_type))
+            self._views.extend((view, chunk, base))
+            if sys.byteorder != 'little':
+                values = array(_typecode(column_type), view)
+                values.byteswap()
+                view = values
+            if column_type == 'S':
+                yield [self.strings[i] for i in view]
+            else:
+                yield view
+
+    def column(self, name):
+        """读取整列为列表"""
+        values = []
+        for chunk in self.column_chunks(name):
+            values.extend(chunk)
+        return values
+
+    def iter_rows(self):
+        """按行产出 {列名: 值} 字典"""
+        chunks = [self.column_chunks(name) for name in COLUMN_NAMES if name in self._column_index]
+        names = [name for name in COLUMN_NAMES if name in self._column_index]
+        for group_columns in zip(*chunks):
+            for values in zip(*group_columns):
+                yield dict(zip(names, values))
+
+    def iter_observations(self):
+        """按行还原为 WeatherObservation"""
+        for row in self.iter_rows():
+            yield WeatherObservation(
+                row['region_code'], sys.intern(row['place']), row['temperature'], row['humidity'],
+                sys.intern(row['wind_scale']), row['wind_speed'],
+                condition_code(row['weather1']), condition_code(row['weather2']), row['timestamp'],
+            )
+
+    def close(self):
+        """
+        关闭文件，之前产出的数值列数据随之失效
+
+        调用方仍持有派生的导出（如对其再取 memoryview）时无法立即释放映射，
+        此时交由垃圾回收在最后一个引用消失后解除映射，不抛出异常
+        """
+        for view in self._views:
+            try:
+                view.release()
+            except BufferError:
+                pass
+        self._views.clear()
+        if not self.map.closed:
+            try:
+                self.map.close()
+            except BufferError:
+                pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_snapshot(catalog, path, fmt='wxc', max_workers=8):
+    """
+    抓取全目录天气并流式写出，返回 (成功数, 失败数)
+
+    参数:
+    catalog -- RegionCatalog
+    path -- 输出文件路径
+    fmt -- 导出格式
+    max_workers -- 并发抓取线程数
+    """
+    from weather_client import sweep_catalog
+
+    succeeded = failed = 0
+    with open_writer(path, fmt, catalog) as writer:
+        for code, observation, error in sweep_catalog(catalog, max_workers=max_workers):
+            if observation is None:
+                failed += 1
+                print(f"{catalog.describe(code)}: {error}", file=sys.stderr)
+                continue
+            writer.write(observation)
+            succeeded += 1
+    return succeeded, failed
+
+
+def export_range(sources, path, fmt='wxc', since=None, until=None, catalog=None):
+    """
+    从以往的wxc导出中筛选时间范围内的记录并写出，返回写出条数
+
+    参数:
+    sources -- wxc 文件路径列表
+    path -- 输出文件路径
+    fmt -- 导出格式
+    since -- 起始时间（epoch秒，含）
+    until -- 截止时间（epoch秒，不含）
+    catalog -- RegionCatalog（可选）
+    """
+    count = 0
+    with open_writer(path, fmt, catalog) as writer:
+        for source in sources:
+            with ColumnarReader(source) as reader:
+                for observation in reader.iter_observations():
+                    if since is not None and observation.timestamp < since:
+                        continue
+                    if until is not None and observation.timestamp >= until:
+                        continue
+                    writer.write(observation)
+                    count += 1
+    return count
+
+
+def _parse_time(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp() if text else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='导出天气快照')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    snapshot = subparsers.add_parser('snapshot', help='抓取全目录并导出当前快照')
+    snapshot.add_argument('--workers', type=int, default=8, help='并发抓取线程数')
+
+    history = subparsers.add_parser('range', help='从以往的wxc导出中筛选时间范围')
+    history.add_argument('sources', nargs='+', help='wxc 文件')
+    history.add_argument('--since', help='起始时间，格式 YYYY-mm-dd HH:MM:SS')
+    history.add_argument('--until', help='截止时间，格式 YYYY-mm-dd HH:MM:SS')
+
+    for sub in (snapshot, history):
+        sub.add_argument('--format', choices=sorted(WRITERS), default='wxc', help='导出格式')
+        sub.add_argument('--out', required=True, help='输出文件路径')
+
+    args = parser.parse_args(argv)
+
+    with open('../files/Citys3465个/ChinaCitys.json', 'r', encoding='utf-8') as f:
+        catalog = RegionCatalog(json.load(f))
+
+    if args.command == 'snapshot':
+        succeeded, failed = export_snapshot(catalog, args.out, args.format, args.workers)
+        print(f"已导出 {succeeded} 条，失败 {failed} 条 -> {args.out}")
+    else:
+        count = export_range(args.sources, args.out, args.format,
+                             _parse_time(args.since), _parse_time(args.until), catalog)
+        print(f"已导出 {count} 条 -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+天气查询工作线程池
+
+基于 QThreadPool 的长期线程池，按优先级调度查询任务并复用线程，
+取消任务时直接中止其正在进行的HTTP请求并立即释放线程。
+"""
+import threading
+
+from PySide6.QtCore import QObject, QThreadPool, Signal
+
+from weather_client import (
+    CancelToken, QueryCanceledError, WeatherQueryError,
+    daemon_status_text, query_daemon_status, query_with_fallback, query_via_daemon, thread_session,
+)
+
+# 任务优先级，数值越大越先执行
+PRIORITY_USER = 10  # 用户主动查询
+PRIORITY_REFRESH = 5  # 后台刷新即将过期的数据
+PRIORITY_PREFETCH = 0  # 预取
+
+
+class QueryTaskSignals(QObject):
+    """
+    查询任务的信号
+    """
+    finished = Signal(object, object)  # 成功信号，传递WeatherObservation和QueryTask
+    error = Signal(str, object)  # 错误信号，传递错误信息和任务
+    progress = Signal(int)  # 进度更新信号
+    done = Signal(object)  # 任务结束（成功、失败或取消），传递QueryTask
+
+
+class QueryTask:
+    """
+    单次天气查询任务
+
+    以可调用对象的形式交给 QThreadPool，由Qt负责其生命周期，
+    不会出现线程仍在执行时任务对象已被回收的问题。
+
+    参数:
+    query_list -- 查询参数列表，每个元素为元组(sheng, place, region_code)
+    priority -- 任务优先级
+    daemon_url -- 本地缓存代理地址，为None时直接请求上游API
+    """
+
+    def __init__(self, query_list, priority=PRIORITY_USER, daemon_url=None):
+        self.query_list = query_list
+        self.priority = priority
+        self.daemon_url = daemon_url
+        self.token = CancelToken()
+        self.signals = QueryTaskSignals()
+        self.started = False
+        self.stale = False  # 本地代理返回的是否为过期缓存
+        self.lock = threading.Lock()
+
+    @property
+    def canceled(self):
+        return self.token.canceled
+
+    def run(self):
+        """在线程池线程中执行查询"""
+        with self.lock:
+            if self.token.canceled:
+                # 排队期间已被取消，结束信号已由取消方发出
+                return
+            self.started = True
+
+        try:
+            try:
+                if self.daemon_url:
+                    # 使用代理时由代理完成降级
+                    self.signals.progress.emit(50)
+                    observation, self.stale = query_via_daemon(self.daemon_url, self.query_list[0][2],
+                                                               cancel_token=self.token)
+                else:
+                    observation = query_with_fallback(
+                        self.query_list, session=thread_session(), cancel_token=self.token,
+                        progress=self._report_progress,
+                    )
+            except QueryCanceledError:
+                return
+            except WeatherQueryError as e:
+                # 所有查询都失败（且未被取消），发出错误信号
+                if not self.token.canceled:
+                    self.signals.error.emit(str(e), self)
+                return
+
+            if not self.token.canceled:
+                self.signals.finished.emit(observation, self)
+        finally:
+            # 确保进度条到达100%
+            self.signals.progress.emit(100)
+            self.signals.done.emit(self)
+
+    def _report_progress(self, index, total):
+        # 按已尝试的降级级别估算进度
+        self.signals.progress.emit(int(100 * (index + 1) / (total + 1)))
+
+    def cancel(self):
+        """
+        取消任务并中止正在进行的请求
+
+        任务尚未开始执行时返回True，此时由调用方负责发出结束信号
+        """
+        with self.lock:
+            self.token.cancel()
+            return not self.started
+
+
+class DaemonStatusTask:
+    """
+    读取本地代理状态的任务，finished 信号传递状态描述文本
+
+    参数:
+    daemon_url -- 本地缓存代理地址
+    """
+
+    def __init__(self, daemon_url):
+        self.daemon_url = daemon_url
+        self.signals = QueryTaskSignals()
+
+    def run(self):
+        """在线程池线程中读取 /status"""
+        try:
+            try:
+                text = daemon_status_text(query_daemon_status(self.daemon_url))
+            except WeatherQueryError as e:
+                self.signals.error.emit(str(e), self)
+                return
+            self.signals.finished.emit(text, self)
+        finally:
+            self.signals.done.emit(self)
+
+
+class WeatherWorkerPool(QObject):
+    """
+    长期存在的查询线程池
+
+    参数:
+    max_threads -- 最大并发线程数
+    parent -- 父对象
+    """
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # 空闲线程不回收，避免每次查询重新创建线程
+        self.pool.setExpiryTimeout(-1)
+        self.tasks = set()  # 尚未结束的任务
+
+    def submit(self, query_list, priority=PRIORITY_USER, daemon_url=None):
+        """
+        提交查询任务，返回 QueryTask，调用方连接其 signals 获取结果
+
+        参数:
+        query_list -- 查询参数列表，每个元素为元组(sheng, place, region_code)
+        priority -- 任务优先级
+        daemon_url -- 本地缓存代理地址
+        """
+        task = QueryTask(query_list, priority, daemon_url)
+        task.signals.done.connect(self.tasks.discard)
+        self.tasks.add(task)
+        self.pool.start(task.run, priority)
+        return task
+
+    def submit_status(self, daemon_url):
+        """
+        以最低优先级提交读取本地代理状态的任务，返回 DaemonStatusTask
+
+        参数:
+        daemon_url -- 本地缓存代理地址
+        """
+        task = DaemonStatusTask(daemon_url)
+        self.pool.start(task.run, PRIORITY_PREFETCH)
+        return task
+
+    def cancel(self, task):
+        """
+        取消任务: 排队中的任务出队时直接跳过，正在执行的中止其请求
+
+        参数:
+        task -- submit() 返回的 QueryTask
+        """
+        if task.cancel():
+            # 任务从未开始执行，不会占用线程，直接发出结束信号
+            task.signals.progress.emit(100)
+            task.signals.done.emit(task)
+
+    def active_count(self):
+        """正在执行或排队的任务数"""
+        return len(self.tasks)
+
+    def shutdown(self, msecs=2000):
+        """取消所有任务并等待线程池结束"""
+        for task in list(self.tasks):
+            self.cancel(task)
+        return self.pool.waitForDone(msecs)
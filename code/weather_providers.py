@@ -0,0 +1,213 @@
+"""
+天气服务商配置
+
+每个服务商描述请求地址、请求参数模板、响应字段映射和调用配额，
+把不同服务商的响应统一转换成 WeatherObservation.from_response()
+使用的字段（与 apihz 接口相同的字段名）。
+
+配置文件为JSON:
+{
+  "providers": [
+    {
+      "name": "apihz",
+      "url": "https://cn.apihz.cn/api/tianqi/tqyb.php",
+      "params": {"id": "${WEATHER_API_ID}", "sheng": "{sheng}", "place": "{place}"},
+      "fields": {"temperature": "data.now.temp", "weather2": "data.forecast.0.text"},
+      "quota": {"per_second": 5, "burst": 10, "per_day": 10000}
+    }
+  ]
+}
+
+params 中的 {sheng}、{place} 替换为查询的省份和地点，${变量} 从环境变量展开，
+凭据不写入配置文件。默认配置的 apihz 服务商需要设置:
+WEATHER_API_ID  -- apihz 开发者ID
+WEATHER_API_KEY -- apihz 通讯秘钥
+fields 为 通用字段名 -> 响应中的路径，用 . 分隔，数字表示列表下标，
+未配置的字段按同名字段读取。
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+# 服务商配置文件路径
+PROVIDERS_PATH = os.environ.get('WEATHER_PROVIDERS', '../files/providers.json')
+
+# 通用观测字段
+COMMON_FIELDS = ('place', 'temperature', 'humidity', 'windScale', 'windSpeed', 'weather1', 'weather2')
+
+# 有效响应必须包含的字段
+REQUIRED_FIELDS = ('place', 'temperature')
+
+# 配额配置可用的字段
+QUOTA_FIELDS = ('per_second', 'burst', 'per_day')
+
+
+class Quota:
+    """
+    服务商调用配额，超出时默认跳过该服务商，批量抓取可用 wait_time() 等待额度恢复
+
+    参数:
+    per_second -- 每秒补充的调用次数，None表示不限
+    burst -- 短时突发上限，默认与 per_second 相同
+    per_day -- 每日调用上限，None表示不限
+    """
+
+    def __init__(self, per_second=None, burst=None, per_day=None):
+        self.per_second = per_second
+        self.burst = burst or max(1, per_second or 1)
+        self.per_day = per_day
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.day = datetime.date.today()
+        self.used_today = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """尝试占用一次调用额度，额度不足时返回False"""
+        with self.lock:
+            today = datetime.date.today()
+            if today != self.day:
+                self.day = today
+                self.used_today = 0
+            if self.per_day is not None and self.used_today >= self.per_day:
+                return False
+            if self.per_second:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.per_second)
+                self.updated = now
+                if self.tokens < 1:
+                    return False
+                self.tokens -= 1
+            self.used_today += 1
+            return True
+
+    def wait_time(self):
+        """距离下一次可用额度的秒数，当日额度已用完时返回None"""
+        with self.lock:
+            if (self.per_day is not None and datetime.date.today() == self.day
+                    and self.used_today >= self.per_day):
+                return None
+            if not self.per_second:
+                return 0.0
+            tokens = min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.per_second)
+            return max(0.0, (1 - tokens) / self.per_second)
+
+    def remaining_today(self):
+        """今日剩余调用次数，不限时返回None"""
+        with self.lock:
+            if self.per_day is None:
+                return None
+            if datetime.date.today() != self.day:
+                return self.per_day
+            return max(0, self.per_day - self.used_today)
+
+
+def _resolve(payload, path):
+    # 按 a.b.0.c 形式的路径读取嵌套字段，不存在时返回None
+    value = payload
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+class Provider:
+    """
+    单个天气服务商
+
+    参数:
+    name -- 服务商名称
+    url -- 请求地址
+    params -- 请求参数模板
+    fields -- 通用字段名 -> 响应路径
+    quota -- Quota，默认不限
+    """
+
+    def __init__(self, name, url, params=None, fields=None, quota=None):
+        self.name = name
+        self.url = url
+        self.params = params if params is not None else {'sheng': '{sheng}', 'place': '{place}'}
+        self.fields = {field: field for field in COMMON_FIELDS}
+        self.fields.update(fields or {})
+        self.quota = quota or Quota()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        从配置字典创建服务商
+
+        参数:
+        config -- 配置文件中 providers 列表的一项
+        """
+        try:
+            name, url = config['name'], config['url']
+        except KeyError as e:
+            raise ValueError(f"服务商配置缺少字段: {e}")
+        params = {param: os.path.expandvars(str(value)) for param, value in config.get('params', {}).items()}
+        for param, value in params.items():
+            if '$' in value:
+                print(f"服务商 {name} 的参数 {param} 引用的环境变量未设置: {value}")
+        quota = config.get('quota') or {}
+        if not isinstance(quota, dict):
+            raise ValueError(f"服务商 {name} 的配额配置应为对象")
+        unknown = set(quota) - set(QUOTA_FIELDS)
+        if unknown:
+            raise ValueError(f"服务商 {name} 的配额配置包含未知字段: {', '.join(sorted(unknown))}")
+        for key, value in quota.items():
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                raise ValueError(f"服务商 {name} 的配额 {key} 应为正数: {value!r}")
+        return cls(name, url, params or None, config.get('fields'), Quota(**quota))
+
+    def request_params(self, sheng, place):
+        """
+        生成查询参数
+
+        参数:
+        sheng -- 省份名称
+        place -- 地点名称
+        """
+        return {param: value.replace('{sheng}', sheng).replace('{place}', place)
+                for param, value in self.params.items()}
+
+    def parse(self, payload):
+        """
+        将服务商响应转换为通用字段字典，缺少必要字段时抛出 ValueError
+
+        参数:
+        payload -- response.json() 得到的对象
+        """
+        if not isinstance(payload, dict):
+            raise ValueError(f"{self.name} 返回无效数据")
+        data = {}
+        for field, path in self.fields.items():
+            value = _resolve(payload, path)
+            # 响应中没有的字段不输出，按缺失处理
+            if value is not None:
+                data[field] = value
+        if any(field not in data for field in REQUIRED_FIELDS):
+            raise ValueError(f"{self.name} 返回无效数据")
+        return data
+
+
+def load_providers(path=None):
+    """
+    从配置文件加载服务商列表，文件不存在时返回空列表
+
+    参数:
+    path -- 配置文件路径，默认为 PROVIDERS_PATH
+    """
+    path = path or PROVIDERS_PATH
+    if not os.path.exists(path):
+        print(f"未找到天气服务商配置: {path}")
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return [Provider.from_config(item) for item in config.get('providers', [])]
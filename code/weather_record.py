@@ -0,0 +1,268 @@
+"""
+天气观测记录
+
+将API返回的原始字典一次性解析为紧凑的观测记录:
+数值字段解析为浮点数，天气现象转为整型编码，
+时间戳保存为epoch秒，查询级别以区域编码表示。
+"""
+import sys
+import threading
+import time
+import math
+from datetime import datetime
+
+# 区域编码各级的进位（省 * 10000 + 市 * 100 + 区县）
+PROVINCE_UNIT = 10000
+CITY_UNIT = 100
+
+# 区域级别
+LEVEL_PROVINCE = 0
+LEVEL_CITY = 1
+LEVEL_AREA = 2
+
+# 天气现象编码表，0 保留给未知/缺失
+CONDITIONS = ['']
+_CONDITION_CODES = {'': 0}
+_CONDITION_LOCK = threading.Lock()
+
+
+def condition_code(name):
+    """
+    获取天气现象的整型编码，首次出现的现象会被登记
+
+    参数:
+    name -- 天气现象名称，如 "多云"
+    """
+    name = name or ''
+    code = _CONDITION_CODES.get(name)
+    if code is not None:
+        return code
+    # 登记新现象需加锁，避免并发登记时编码与名称错位
+    with _CONDITION_LOCK:
+        code = _CONDITION_CODES.get(name)
+        if code is None:
+            code = len(CONDITIONS)
+            CONDITIONS.append(sys.intern(name))
+            _CONDITION_CODES[CONDITIONS[code]] = code
+    return code
+
+
+def condition_name(code):
+    """根据编码获取天气现象名称"""
+    return CONDITIONS[code]
+
+
+def parse_number(value):
+    """将API返回的数值字符串解析为浮点数，无法解析时返回NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def parse_text(value):
+    """将API返回的文本字段转换为驻留字符串，缺失（None）时返回空字符串"""
+    return sys.intern('' if value is None else str(value))
+
+
+def format_number(value):
+    """格式化数值字段用于显示，缺失值显示为 --"""
+    if math.isnan(value):
+        return '--'
+    return f"{value:g}"
+
+
+def region_level(code):
+    """根据区域编码判断级别"""
+    if code % CITY_UNIT:
+        return LEVEL_AREA
+    if code % PROVINCE_UNIT:
+        return LEVEL_CITY
+    return LEVEL_PROVINCE
+
+
+def parent_code(code):
+    """获取上一级区域编码，省级返回0"""
+    level = region_level(code)
+    if level == LEVEL_AREA:
+        return code - code % CITY_UNIT
+    if level == LEVEL_CITY:
+        return code - code % PROVINCE_UNIT
+    return 0
+
+
+def ancestor_codes(code):
+    """获取区域自身及所有上级的编码（由下至上）"""
+    codes = [code]
+    code = parent_code(code)
+    while code:
+        codes.append(code)
+        code = parent_code(code)
+    return codes
+
+
+class RegionCatalog:
+    """
+    省/市/区县行政区划索引
+
+    原始城市数据中的行政代码存在重复（如台湾省各市、直辖市的区县），
+    因此按数据中的位置为每个区域分配唯一的紧凑编码:
+    省 * 10000 + 市 * 100 + 区县（均从1开始）。
+
+    参数:
+    data -- ChinaCitys.json 加载后的列表
+    """
+
+    def __init__(self, data):
+        self.names = {}  # 区域编码 -> 名称
+        self.admin_codes = {}  # 区域编码 -> 原始行政代码
+        self._codes = {}  # (省, 市, 区县) 名称 -> 区域编码
+
+        for p_index, province in enumerate(data, 1):
+            if len(province["citys"]) >= PROVINCE_UNIT // CITY_UNIT:
+                raise ValueError(f"{province['province']} 城市数量超出编码范围")
+            p_code = p_index * PROVINCE_UNIT
+            self._add(p_code, province["province"], province["code"], (province["province"], None, None))
+
+            for c_index, city in enumerate(province["citys"], 1):
+                if len(city["areas"]) >= CITY_UNIT:
+                    raise ValueError(f"{city['city']} 区县数量超出编码范围")
+                c_code = p_code + c_index * CITY_UNIT
+                self._add(c_code, city["city"], city["code"], (province["province"], city["city"], None))
+
+                for a_index, area in enumerate(city["areas"], 1):
+                    self._add(c_code + a_index, area["area"], area["code"],
+                              (province["province"], city["city"], area["area"]))
+
+    def _add(self, code, name, admin_code, key):
+        self.names[code] = sys.intern(name)
+        self.admin_codes[code] = admin_code
+        self._codes.setdefault(key, code)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def lookup(self, sheng, city=None, area=None):
+        """
+        根据名称查找区域编码，找不到时返回None
+
+        参数:
+        sheng -- 省份名称
+        city -- 城市名称（可选）
+        area -- 区县名称（可选）
+        """
+        return self._codes.get((sheng, city, area))
+
+    def name(self, code):
+        """获取区域名称"""
+        return self.names.get(code, '')
+
+    def province_name(self, code):
+        """获取区域所属省份名称"""
+        return self.names.get(code - code % PROVINCE_UNIT, '')
+
+    def describe(self, code):
+        """生成 "省/地点" 形式的查询级别描述"""
+        return f"{self.province_name(code)}/{self.name(code)}"
+
+    def query_list(self, code):
+        """
+        生成按县级→市级→省级降级的查询列表
+
+        返回 [(sheng, place, region_code), ...]
+        """
+        sheng = self.province_name(code)
+        return [(sheng, self.names[level_code], level_code) for level_code in ancestor_codes(code)]
+
+
+class WeatherObservation:
+    """
+    单条天气观测记录
+
+    参数:
+    region_code -- 查询成功的区域编码
+    place -- API返回的地点名称
+    temperature -- 温度（℃）
+    humidity -- 湿度（%）
+    wind_scale -- 风力等级
+    wind_speed -- 风速（m/s）
+    weather1 -- 当前天气现象编码
+    weather2 -- 未来天气现象编码
+    timestamp -- 获取时间（epoch秒）
+    """
+    __slots__ = ('region_code', 'place', 'temperature', 'humidity', 'wind_scale',
+                 'wind_speed', 'weather1', 'weather2', 'timestamp')
+
+    def __init__(self, region_code, place, temperature, humidity, wind_scale,
+                 wind_speed, weather1, weather2, timestamp):
+        self.region_code = region_code
+        self.place = place
+        self.temperature = temperature
+        self.humidity = humidity
+        self.wind_scale = wind_scale
+        self.wind_speed = wind_speed
+        self.weather1 = weather1
+        self.weather2 = weather2
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_response(cls, payload, region_code, timestamp=None):
+        """
+        从API响应字典解析观测记录
+
+        参数:
+        payload -- response.json() 得到的字典
+        region_code -- 查询成功的区域编码
+        timestamp -- 获取时间，默认为当前时间
+        """
+        return cls(
+            region_code,
+            parse_text(payload.get('place')),
+            parse_number(payload.get('temperature')),
+            parse_number(payload.get('humidity')),
+            parse_text(payload.get('windScale')),
+            parse_number(payload.get('windSpeed')),
+            condition_code(payload.get('weather1')),
+            condition_code(payload.get('weather2')),
+            time.time() if timestamp is None else timestamp,
+        )
+
+    @property
+    def weather1_name(self):
+        """当前天气现象名称"""
+        return CONDITIONS[self.weather1]
+
+    @property
+    def weather2_name(self):
+        """未来天气现象名称"""
+        return CONDITIONS[self.weather2]
+
+    @property
+    def timestamp_text(self):
+        """格式化的获取时间"""
+        return datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+    def age(self, now=None):
+        """记录距今的秒数"""
+        return (time.time() if now is None else now) - self.timestamp
+
+    def to_dict(self):
+        """转换为与API字段名一致的字典，用于导出或调试"""
+        return {
+            'region_code': self.region_code,
+            'place': self.place,
+            'temperature': self.temperature,
+            'humidity': self.humidity,
+            'windScale': self.wind_scale,
+            'windSpeed': self.wind_speed,
+            'weather1': self.weather1_name,
+            'weather2': self.weather2_name,
+            'timestamp': self.timestamp,
+        }
+
+    def __repr__(self):
+        return (f"WeatherObservation({self.region_code}, {self.place!r}, "
+                f"{format_number(self.temperature)}℃, {self.weather1_name}转{self.weather2_name})")
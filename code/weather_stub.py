@@ -0,0 +1,219 @@
+"""
+本地模拟天气服务商
+
+在本机启动一个或多个假的天气接口，用于在不访问真实服务商的情况下
+测试多服务商路由、故障转移和配额。每个模拟服务商可设置响应格式、
+响应延迟和失败率，并可随时修改以模拟服务商变慢或宕机。
+
+响应格式:
+apihz  -- 与 apihz 接口相同的扁平字段，参数 sheng、place
+nested -- 嵌套结构 {"data": {"location": ..., "now": {...}, "forecast": [...]}}，参数 province、location
+
+用法:
+python weather_stub.py --stub fast:apihz:0.02 --stub slow:nested:0.3 --stub flaky:nested:0.05:0.5 \
+    --config-out stub_providers.json
+WEATHER_PROVIDERS=stub_providers.json python AIweatherAPP_API.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# 各响应格式对应的服务商配置（请求参数和字段映射）
+SHAPES = {
+    'apihz': {
+        'params': {'sheng': '{sheng}', 'place': '{place}'},
+    },
+    'nested': {
+        'params': {'province': '{sheng}', 'location': '{place}'},
+        'fields': {
+            'place': 'data.location',
+            'temperature': 'data.now.temp',
+            'humidity': 'data.now.humidity',
+            'windScale': 'data.now.wind.scale',
+            'windSpeed': 'data.now.wind.speed',
+            'weather1': 'data.now.text',
+            'weather2': 'data.forecast.0.text',
+        },
+    },
+}
+
+# 模拟数据使用的天气现象
+_CONDITION_NAMES = ('晴', '多云', '阴', '小雨', '中雨', '大雨', '暴雨', '雷阵雨', '小雪', '雾', '霾')
+
+
+def synthetic_weather(place):
+    """根据地点名称生成固定的模拟天气（通用字段）"""
+    seed = zlib.crc32(place.encode('utf-8'))
+    return {
+        'place': place,
+        'temperature': str(seed % 40 - 5),
+        'humidity': str(seed % 70 + 20),
+        'windScale': f"{seed % 6 + 1}级",
+        'windSpeed': f"{seed % 90 / 10:.1f}",
+        'weather1': _CONDITION_NAMES[seed % len(_CONDITION_NAMES)],
+        'weather2': _CONDITION_NAMES[seed // 7 % len(_CONDITION_NAMES)],
+    }
+
+
+def render(shape, weather):
+    """按响应格式生成响应对象"""
+    if shape == 'apihz':
+        return dict(weather)
+    return {
+        'status': 'ok',
+        'data': {
+            'location': weather['place'],
+            'now': {
+                'temp': float(weather['temperature']),
+                'humidity': float(weather['humidity']),
+                'wind': {'scale': weather['windScale'], 'speed': float(weather['windSpeed'])},
+                'text': weather['weather1'],
+            },
+            'forecast': [{'text': weather['weather2']}],
+        },
+    }
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """处理模拟天气请求"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        params = {name: values[0] for name, values in parse_qs(urlsplit(self.path).query).items()}
+        place = params.get('place') or params.get('location')
+        server.count_request()
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.8, 1.2))
+        if random.random() < server.failure_rate:
+            self._send(503, {'error': '模拟服务商故障'})
+        elif not place:
+            self._send(400, {'error': '缺少地点参数'})
+        else:
+            self._send(200, render(server.shape, synthetic_weather(place)))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProvider(ThreadingHTTPServer):
+    """
+    模拟天气服务商
+
+    参数:
+    shape -- 响应格式，SHAPES 的键
+    latency -- 平均响应延迟（秒）
+    failure_rate -- 返回503的概率（0~1）
+    host -- 监听地址
+    port -- 监听端口，0表示自动分配
+    """
+    daemon_threads = True
+
+    def __init__(self, shape='apihz', latency=0.0, failure_rate=0.0, host='127.0.0.1', port=0):
+        if shape not in SHAPES:
+            raise ValueError(f"未知的响应格式: {shape}")
+        super().__init__((host, port), StubRequestHandler)
+        self.shape = shape
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/weather"
+
+    def provider_config(self, name, quota=None):
+        """
+        生成指向该模拟服务商的服务商配置（weather_providers 配置文件格式）
+
+        参数:
+        name -- 服务商名称
+        quota -- 可选的配额配置字典
+        """
+        config = {'name': name, 'url': self.url}
+        config.update(SHAPES[self.shape])
+        if quota:
+            config['quota'] = quota
+        return config
+
+    def start(self):
+        """在后台线程中运行，返回自身"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止后台线程并关闭端口"""
+        self.shutdown()
+        self.server_close()
+
+
+def parse_stub(text):
+    """解析 名称:格式[:延迟[:失败率]] 形式的命令行参数"""
+    parts = text.split(':')
+    if len(parts) < 2:
+        raise argparse.ArgumentTypeError(f"格式应为 名称:格式[:延迟[:失败率]]: {text}")
+    name, shape = parts[0], parts[1]
+    if shape not in SHAPES:
+        raise argparse.ArgumentTypeError(f"未知的响应格式: {shape}")
+    try:
+        latency = float(parts[2]) if len(parts) > 2 else 0.0
+        failure_rate = float(parts[3]) if len(parts) > 3 else 0.0
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的延迟或失败率: {text}")
+    return name, shape, latency, failure_rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地模拟天气服务商')
+    parser.add_argument('--stub', action='append', type=parse_stub, required=True,
+                        help='名称:格式[:延迟[:失败率]]，可重复指定')
+    parser.add_argument('--config-out', help='写出指向这些模拟服务商的服务商配置文件')
+    args = parser.parse_args(argv)
+
+    stubs = []
+    for name, shape, latency, failure_rate in args.stub:
+        stub = StubProvider(shape, latency, failure_rate).start()
+        stubs.append((name, stub))
+        print(f"{name}: {stub.url} ({shape}, 延迟 {latency}s, 失败率 {failure_rate})")
+
+    if args.config_out:
+        config = {'providers': [stub.provider_config(name) for name, stub in stubs]}
+        with open(args.config_out, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        print(f"服务商配置已写入 {args.config_out}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _, stub in stubs:
+            stub.stop()
+
+
+if __name__ == '__main__':
+    main()